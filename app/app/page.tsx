@@ -28,6 +28,7 @@ type Product = {
   source_url: string | null;
   video_storage_url: string | null;
   analysis?: ProductAnalysis | null;
+  risks?: RiskItem[] | null;
 };
 
 function Pill({ children }: { children: React.ReactNode }) {
@@ -380,6 +381,31 @@ function MediaHero({ p }: { p: Product }) {
 
 /** --- DB helpers based on run_date --- **/
 
+const RUN_REGION = process.env.NEXT_PUBLIC_RUN_REGION ?? "FR";
+
+type Leaderboard = {
+  run_date: string;
+  run_dates: string[];
+  products: Product[];
+};
+
+// classement publié par le pipeline (table leaderboards) : une seule lecture indexée
+async function fetchLeaderboards(limit = 2) {
+  const { data, error } = await supabase
+    .from("leaderboards")
+    .select("payload")
+    .eq("region", RUN_REGION)
+    .order("run_date", { ascending: false })
+    .limit(limit);
+
+  if (error) {
+    console.error(error);
+    return [];
+  }
+  // produits masqués retirés du payload à la source (trigger products_hidden_leaderboards)
+  return (data ?? []).map((r) => (r as { payload: Leaderboard }).payload);
+}
+
 async function fetchRecentRunDates(limitUniq = 2) {
   const { data, error } = await supabase
     .from("products")
@@ -405,7 +431,7 @@ async function fetchProductsByRunDate(runDate: string) {
   const { data, error } = await supabase
     .from("products")
     .select(
-      "id,run_date,created_at,title,slug,category,score,sources,summary,analysis,image_url,source_url,video_storage_url,is_hidden,mode"
+      "id,run_date,created_at,title,slug,category,score,sources,summary,risks,image_url,source_url,video_storage_url,is_hidden,mode"
     )
     .eq("run_date", runDate)
     .eq("is_hidden", false)
@@ -476,6 +502,19 @@ export default function DashboardPage() {
         }
         if (mounted) setEmail(sessionData.session.user.email ?? null);
 
+        const boards = await fetchLeaderboards(2);
+        if (boards.length > 0) {
+          if (mounted) {
+            setCurrentRunDate(boards[0].run_date || "—");
+            setLastRunDate(boards[1]?.run_date || "—");
+            setProducts((boards[0].products ?? []).slice(0, 60));
+            setLastWeekProducts((boards[1]?.products ?? []).slice(0, 12));
+            setLoading(false);
+          }
+          return;
+        }
+
+        // pas encore de classement publié : lecture directe de products
         const runDates = await fetchRecentRunDates(2);
         const current = runDates[0] ?? "";
         const previous = runDates[1] ?? "";
@@ -709,7 +748,7 @@ export default function DashboardPage() {
                     {p.summary}
                   </p>
 
-                  <RiskBlock risks={p.analysis?.risks} />
+                  <RiskBlock risks={p.risks ?? p.analysis?.risks} />
 
                   <button
                     type="button"
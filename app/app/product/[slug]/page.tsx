@@ -7,6 +7,7 @@ import { useParams, useRouter } from "next/navigation";
 
 type Product = {
   id: string;
+  run_date: string;
   title: string;
   slug: string;
   category: string;
@@ -15,6 +16,7 @@ type Product = {
   sources: string[];
   summary: string;
   image_url: string | null;
+  image_detail_url?: string | null;
   image_source: string | null;
   source_url: string | null;
   video_storage_url: string | null;
@@ -256,7 +258,7 @@ export default function ProductPage() {
       const { data, error } = await supabase
         .from("products")
         .select(
-          "id,title,slug,category,score,tags,sources,summary,image_url,image_source,source_url,video_storage_url,analysis,score_breakdown"
+          "id,run_date,title,slug,category,score,tags,sources,summary,image_url,image_detail_url,image_source,source_url,video_storage_url,analysis,score_breakdown"
         )
         .eq("slug", slug)
         .single();
@@ -264,8 +266,29 @@ export default function ProductPage() {
       if (error) {
         console.error(error);
         if (mounted) setP(null);
-      } else if (mounted) {
-        setP(data as Product);
+      } else {
+        const product = data as Product;
+
+        // analyse complète stockée à part (product_analyses, un row par run) ; anciens
+        // rows : dans products. Dernière analyse <= run_date (rows d'avant le backfill)
+        if (!product.analysis) {
+          const { data: detail, error: detailError } = await supabase
+            .from("product_analyses")
+            .select("analysis,score_breakdown")
+            .eq("slug", slug)
+            .lte("run_date", product.run_date)
+            .order("run_date", { ascending: false })
+            .limit(1)
+            .maybeSingle();
+
+          if (detailError) console.error(detailError);
+          if (detail) {
+            product.analysis = detail.analysis;
+            product.score_breakdown = detail.score_breakdown;
+          }
+        }
+
+        if (mounted) setP(product);
       }
 
       if (mounted) setLoading(false);
@@ -352,7 +375,7 @@ export default function ProductPage() {
             <div className="mt-6">
               <ProductMedia
                 title={p.title}
-                imageUrl={p.image_url}
+                imageUrl={p.image_detail_url ?? p.image_url}
                 sourceUrl={p.source_url}
                 videoStorageUrl={p.video_storage_url}
                 score={p.score}
@@ -23,6 +23,7 @@ type Product = {
   image_url: string | null;
   video_storage_url?: string | null;
   analysis?: ProductAnalysis | null;
+  risks?: RiskItem[] | null;
 };
 
 function cn(...classes: Array<string | false | null | undefined>) {
@@ -237,21 +238,30 @@ function HeroMediaCard({
   );
 }
 
-export default async function HomePage() {
-  const supabase = createSupabaseServerClient();
-
-  const { data: settingsRows } = await supabase
-    .from("settings")
-    .select("key,value")
-    .in("key", ["current_run_date"]);
-
-  const settings = new Map<string, any>();
-  (settingsRows ?? []).forEach((r) => settings.set(r.key, r.value));
+type SupabaseServerClient = ReturnType<typeof createSupabaseServerClient>;
+
+async function fetchTeaserProducts(
+  supabase: SupabaseServerClient,
+  currentRunDate: string,
+  teaserN: number
+): Promise<Product[]> {
+  // classement publié par le pipeline (table leaderboards) : une seule lecture indexée
+  const { data: leaderboardRow } = await supabase
+    .from("leaderboards")
+    .select("payload")
+    .eq("region", process.env.NEXT_PUBLIC_RUN_REGION ?? "FR")
+    .order("run_date", { ascending: false })
+    .limit(1)
+    .maybeSingle();
 
-  const teaserN = 3;
-  const currentRunDate = String(settings.get("current_run_date")?.v ?? "");
+  const published = (leaderboardRow?.payload as { products?: Product[] } | null)
+    ?.products;
+  if (published && published.length > 0) {
+    // produits masqués retirés du payload à la source (trigger products_hidden_leaderboards)
+    return published.slice(0, teaserN);
+  }
 
-  // Récupère le run_date le plus récent directement depuis les produits
+  // Sinon : run_date le plus récent directement depuis les produits
   const { data: latestRunRow } = await supabase
     .from("products")
     .select("run_date")
@@ -265,7 +275,7 @@ export default async function HomePage() {
   const productsQuery = supabase
     .from("products")
     .select(
-      "id,title,slug,category,score,tags,sources,summary,analysis,image_url,video_storage_url"
+      "id,title,slug,category,score,tags,sources,summary,risks,image_url,video_storage_url"
     )
     .eq("is_hidden", false)
     .order("score", { ascending: false })
@@ -276,6 +286,24 @@ export default async function HomePage() {
   }
 
   const { data: products } = await productsQuery;
+  return (products ?? []) as Product[];
+}
+
+export default async function HomePage() {
+  const supabase = createSupabaseServerClient();
+
+  const { data: settingsRows } = await supabase
+    .from("settings")
+    .select("key,value")
+    .in("key", ["current_run_date"]);
+
+  const settings = new Map<string, any>();
+  (settingsRows ?? []).forEach((r) => settings.set(r.key, r.value));
+
+  const teaserN = 3;
+  const currentRunDate = String(settings.get("current_run_date")?.v ?? "");
+
+  const products = await fetchTeaserProducts(supabase, currentRunDate, teaserN);
 
   const weekLabel = currentRunDate
     ? `Semaine du ${currentRunDate}`
@@ -492,7 +520,7 @@ export default async function HomePage() {
                   {p.summary || "Analyse complète disponible après connexion."}
                 </p>
 
-                <RiskBlock risks={p.analysis?.risks} />
+                <RiskBlock risks={p.risks ?? p.analysis?.risks} />
 
                 <div className="mt-5 flex flex-col gap-3">
                   <Link
@@ -0,0 +1,354 @@
+"""
+Stand-in local de l'API Apify (sous-ensemble utilisé par tiktok_hashtag_apify).
+
+  python -m scripts.bench.apify_stub --port 8765 --items 100000 --run-seconds 5
+  APIFY_API_BASE=http://127.0.0.1:8765/v2 APIFY_TOKEN=stub python -m scripts.weekly_run_v3
+
+  python -m scripts.bench.apify_stub --bench --items 100000   # mesure le connecteur hors ligne
+
+Endpoints :
+  POST /v2/acts/{actor}/runs
+  GET  /v2/actor-runs/{run_id}
+  GET  /v2/datasets/{dataset_id}
+  GET  /v2/datasets/{dataset_id}/items?offset=&limit=&fields=&clean=
+
+Avec --empty-rate, une part des items est vide / masquée : comme chez Apify, clean=true
+les retire de la page, qui revient alors plus courte que `limit` alors que la suite
+existe (X-Apify-Pagination-Total = taille du dataset brut).
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from scripts.bench.synthetic import synthetic_apify_item
+
+MAX_ITEMS = 100_000
+
+
+class StubConfig:
+    def __init__(
+        self,
+        items: int = 1000,
+        run_seconds: float = 2.0,
+        fail_rate: float = 0.0,
+        timeout_rate: float = 0.0,
+        http_error_rate: float = 0.0,
+        latency_ms: int = 0,
+        empty_rate: float = 0.0,
+        seed: int = 1,
+    ) -> None:
+        self.items = max(0, min(int(items), MAX_ITEMS))
+        self.run_seconds = run_seconds
+        self.fail_rate = fail_rate
+        self.timeout_rate = timeout_rate
+        self.http_error_rate = http_error_rate
+        self.latency_ms = latency_ms
+        self.empty_rate = empty_rate
+        self.seed = seed
+
+
+class StubState:
+    def __init__(self, cfg: StubConfig) -> None:
+        self.cfg = cfg
+        self.lock = threading.Lock()
+        self.rng = random.Random(cfg.seed)
+        self.runs: Dict[str, Dict[str, Any]] = {}
+        self.datasets: Dict[str, Dict[str, Any]] = {}
+        self.counters: Dict[str, int] = {
+            "runs": 0, "polls": 0, "item_pages": 0, "items_served": 0, "items_cleaned": 0, "http_errors": 0,
+        }
+
+    def start_run(self, actor_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        with self.lock:
+            run_id = uuid.uuid4().hex[:17]
+            dataset_id = uuid.uuid4().hex[:17]
+
+            roll = self.rng.random()
+            if roll < self.cfg.fail_rate:
+                final = "FAILED"
+            elif roll < self.cfg.fail_rate + self.cfg.timeout_rate:
+                final = "TIMED-OUT"
+            else:
+                final = "SUCCEEDED"
+
+            post_urls = payload.get("postURLs") or []
+            if post_urls:
+                # phase vidéo : un item par URL demandée, avec mediaUrls
+                self.datasets[dataset_id] = {"post_urls": list(post_urls), "count": len(post_urls)}
+            else:
+                self.datasets[dataset_id] = {"post_urls": None, "count": self.cfg.items,
+                                             "with_media": bool(payload.get("shouldDownloadVideos"))}
+
+            run = {
+                "id": run_id,
+                "actId": actor_id,
+                "status": "RUNNING",
+                "defaultDatasetId": dataset_id,
+                "_started": time.time(),
+                "_final": final,
+            }
+            self.runs[run_id] = run
+            self.counters["runs"] += 1
+            return self._public_run(run)
+
+    def get_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            run = self.runs.get(run_id)
+            if run is None:
+                return None
+            self.counters["polls"] += 1
+            if run["status"] == "RUNNING" and time.time() - run["_started"] >= self.cfg.run_seconds:
+                run["status"] = run["_final"]
+            return self._public_run(run)
+
+    @staticmethod
+    def _public_run(run: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: v for k, v in run.items() if not k.startswith("_")}
+
+    def is_empty(self, i: int) -> bool:
+        # déterministe par index : deux lectures du même dataset voient les mêmes trous
+        return bool(self.cfg.empty_rate) and random.Random(self.cfg.seed * 1_000_003 + i).random() < self.cfg.empty_rate
+
+    def non_empty_count(self, dataset_id: str) -> int:
+        ds = self.datasets[dataset_id]
+        return sum(1 for i in range(ds["count"]) if not self.is_empty(i))
+
+    def dataset_items(
+        self, dataset_id: str, offset: int, limit: Optional[int], clean: bool = False,
+    ) -> Optional[List[Dict[str, Any]]]:
+        ds = self.datasets.get(dataset_id)
+        if ds is None:
+            return None
+
+        end = ds["count"] if limit is None else min(ds["count"], offset + limit)
+        out: List[Dict[str, Any]] = []
+        cleaned = 0
+
+        if ds["post_urls"] is not None:
+            for url in ds["post_urls"][offset:end]:
+                video_id = url.rstrip("/").rsplit("/", 1)[-1]
+                out.append({
+                    "id": video_id,
+                    "webVideoUrl": url,
+                    "mediaUrls": [f"https://api.apify.com/v2/key-value-stores/stub/records/video-{video_id}.mp4"],
+                })
+        else:
+            for i in range(offset, end):
+                if self.is_empty(i):
+                    if clean:
+                        cleaned += 1
+                        continue
+                    out.append({})
+                    continue
+                out.append(synthetic_apify_item(self.cfg.seed, i, ds["with_media"]))
+
+        with self.lock:
+            self.counters["item_pages"] += 1
+            self.counters["items_served"] += len(out)
+            self.counters["items_cleaned"] += cleaned
+        return out
+
+
+def _project(item: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+    return {f: item[f] for f in fields if f in item}
+
+
+def make_handler(state: StubState) -> type:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format: str, *args: Any) -> None:  # silencieux
+            return
+
+        def _send(self, code: int, body: Any, headers: Optional[Dict[str, str]] = None) -> None:
+            raw = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(raw)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def _inject(self) -> bool:
+            if state.cfg.latency_ms:
+                time.sleep(state.cfg.latency_ms / 1000.0)
+            if state.cfg.http_error_rate and state.rng.random() < state.cfg.http_error_rate:
+                with state.lock:
+                    state.counters["http_errors"] += 1
+                self._send(503, {"error": {"type": "stub-injected", "message": "Service Unavailable"}})
+                return True
+            return False
+
+        def do_POST(self) -> None:
+            path = urlsplit(self.path).path
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b""
+
+            if self._inject():
+                return
+
+            m = re.fullmatch(r"/v2/acts/([^/]+)/runs", path)
+            if not m:
+                self._send(404, {"error": {"type": "page-not-found"}})
+                return
+
+            try:
+                payload = json.loads(body or b"{}")
+            except ValueError:
+                self._send(400, {"error": {"type": "invalid-input"}})
+                return
+
+            self._send(201, {"data": state.start_run(unquote(m.group(1)), payload)})
+
+        def do_GET(self) -> None:
+            parts = urlsplit(self.path)
+            qs = parse_qs(parts.query)
+
+            if self._inject():
+                return
+
+            m = re.fullmatch(r"/v2/actor-runs/([^/]+)", parts.path)
+            if m:
+                run = state.get_run(m.group(1))
+                if run is None:
+                    self._send(404, {"error": {"type": "record-not-found"}})
+                else:
+                    self._send(200, {"data": run})
+                return
+
+            m = re.fullmatch(r"/v2/datasets/([^/]+)", parts.path)
+            if m:
+                ds = state.datasets.get(m.group(1))
+                if ds is None:
+                    self._send(404, {"error": {"type": "record-not-found"}})
+                else:
+                    self._send(200, {"data": {"id": m.group(1), "itemCount": ds["count"]}})
+                return
+
+            m = re.fullmatch(r"/v2/datasets/([^/]+)/items", parts.path)
+            if m:
+                offset = int((qs.get("offset") or ["0"])[0])
+                limit_raw = (qs.get("limit") or [None])[0]
+                limit = int(limit_raw) if limit_raw else None
+                clean = (qs.get("clean") or ["false"])[0].lower() in ("1", "true")
+                items = state.dataset_items(m.group(1), offset, limit, clean)
+                if items is None:
+                    self._send(404, {"error": {"type": "record-not-found"}})
+                    return
+                fields = [f for f in ",".join(qs.get("fields") or []).split(",") if f]
+                if fields:
+                    items = [_project(it, fields) for it in items]
+                self._send(200, items, {
+                    "X-Apify-Pagination-Total": str(state.datasets[m.group(1)]["count"]),
+                    "X-Apify-Pagination-Offset": str(offset),
+                    "X-Apify-Pagination-Limit": str(limit or ""),
+                    "X-Apify-Pagination-Count": str(len(items)),
+                })
+                return
+
+            self._send(404, {"error": {"type": "page-not-found"}})
+
+    return Handler
+
+
+def serve(cfg: StubConfig, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """
+    Démarre le stub dans un thread daemon. L'URL de base est
+    f"http://{host}:{server.server_address[1]}/v2", l'état dans server.state.
+    """
+    state = StubState(cfg)
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    server.state = state  # type: ignore[attr-defined]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _bench(server: ThreadingHTTPServer) -> Dict[str, Any]:
+    from scripts.connectors import http_client
+    from scripts.connectors.tiktok_hashtag_apify import fetch_tiktok_candidates_from_hashtags
+
+    host, port = server.server_address[:2]
+    os.environ["APIFY_API_BASE"] = f"http://{host}:{port}/v2"
+    os.environ.setdefault("APIFY_TOKEN", "stub")
+    os.environ.setdefault("APIFY_POLL_SECONDS", "0.5")
+    os.environ["APIFY_RUN_CACHE_MAX_AGE_SECONDS"] = "0"
+    os.environ["TIKTOK_VIDEOS_LIMIT"] = str(MAX_ITEMS)
+
+    t0 = time.perf_counter()
+    candidates = fetch_tiktok_candidates_from_hashtags()
+    elapsed = time.perf_counter() - t0
+
+    state = server.state  # type: ignore[attr-defined]
+    # pages courtes (clean=true) : le connecteur doit quand même lire tout le dataset
+    expected = sum(
+        state.non_empty_count(d) for d, ds in state.datasets.items() if ds["post_urls"] is None
+    )
+    served = state.counters["items_served"] - sum(
+        ds["count"] for ds in state.datasets.values() if ds["post_urls"] is not None
+    )
+
+    return {
+        "candidates": len(candidates),
+        "dataset_complete": served == expected,
+        "seconds": round(elapsed, 3),
+        "stub": dict(server.state.counters),  # type: ignore[attr-defined]
+        "http": http_client.http_stats(),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Stub local de l'API Apify")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--items", type=int, default=1000, help=f"taille du dataset (max {MAX_ITEMS})")
+    ap.add_argument("--run-seconds", type=float, default=2.0, help="durée simulée d'un run")
+    ap.add_argument("--fail-rate", type=float, default=0.0, help="proba qu'un run finisse FAILED")
+    ap.add_argument("--timeout-rate", type=float, default=0.0, help="proba qu'un run finisse TIMED-OUT")
+    ap.add_argument("--http-error-rate", type=float, default=0.0, help="proba de réponse 503")
+    ap.add_argument("--latency-ms", type=int, default=0, help="latence ajoutée par requête")
+    ap.add_argument("--empty-rate", type=float, default=0.0, help="part d'items vides (retirés par clean=true)")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--bench", action="store_true", help="lance le connecteur contre le stub et affiche les temps")
+    args = ap.parse_args()
+
+    cfg = StubConfig(
+        items=args.items,
+        run_seconds=args.run_seconds,
+        fail_rate=args.fail_rate,
+        timeout_rate=args.timeout_rate,
+        http_error_rate=args.http_error_rate,
+        latency_ms=args.latency_ms,
+        empty_rate=args.empty_rate,
+        seed=args.seed,
+    )
+
+    if args.bench:
+        server = serve(cfg, args.host, 0)
+        print(json.dumps(_bench(server), indent=2))
+        server.shutdown()
+        return
+
+    server = serve(cfg, args.host, args.port)
+    print(f"Apify stub: http://{args.host}:{server.server_address[1]}/v2 ({cfg.items} items)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
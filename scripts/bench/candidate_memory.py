@@ -0,0 +1,97 @@
+"""
+Mémoire et coût d'accès : Candidate (dataclass slots) vs dicts imbriqués historiques.
+
+  python -m scripts.bench.candidate_memory --n 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from scripts.bench.synthetic import synthetic_apify_items
+from scripts.connectors.tiktok_hashtag_apify import candidates_from_items
+from scripts.pipeline.candidate import Candidate
+
+
+def _legacy_dict(c: Candidate) -> Dict[str, Any]:
+    # forme émise par le connecteur avant les records
+    return {
+        "title": c.title,
+        "sources": ["tiktok_hashtag"],
+        "video_storage_url": c.tk.video_storage_url,
+        "signals": {"tiktok_hashtag": c.tk.to_dict()},
+    }
+
+
+def _deep_size(objs: List[Any]) -> int:
+    """
+    Taille retenue (sys.getsizeof récursif) : conteneurs, slots et chaînes comptés de la
+    même façon pour les deux formes, chaque objet une fois par forme.
+    """
+    seen = set()
+    total = 0
+    stack: List[Any] = list(objs)
+    while stack:
+        o = stack.pop()
+        if id(o) in seen:
+            continue
+        seen.add(id(o))
+        total += sys.getsizeof(o)
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set)):
+            stack.extend(o)
+        elif hasattr(type(o), "__slots__"):
+            stack.extend(getattr(o, f) for f in type(o).__slots__ if hasattr(o, f))
+    return total
+
+
+def _timed(fn: Callable[[], Any], repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=100_000)
+    args = ap.parse_args()
+
+    items = synthetic_apify_items(args.n)
+
+    records = candidates_from_items(items)
+    dicts = [_legacy_dict(c) for c in records]
+    rec_bytes = _deep_size(records)
+    dict_bytes = _deep_size(dicts)
+
+    def _sum_records() -> int:
+        return sum(c.tk.views + c.tk.likes + c.tk.shares for c in records)
+
+    def _sum_dicts() -> int:
+        total = 0
+        for c in dicts:
+            tk = (c.get("signals") or {}).get("tiktok_hashtag") or {}
+            total += int(tk.get("views", 0) or 0) + int(tk.get("likes", 0) or 0) + int(tk.get("shares", 0) or 0)
+        return total
+
+    out = {
+        "n": args.n,
+        # même mesure des deux côtés : taille retenue, chaînes comprises
+        "records_bytes_per_candidate": round(rec_bytes / args.n, 1),
+        "dicts_bytes_per_candidate": round(dict_bytes / args.n, 1),
+        "access_records_s": round(_timed(_sum_records), 4),
+        "access_dicts_s": round(_timed(_sum_dicts), 4),
+    }
+    print(json.dumps(out, indent=2))
+
+
+if __name__ == "__main__":
+    main()
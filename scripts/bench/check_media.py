@@ -0,0 +1,146 @@
+"""
+Miroir des médias (pipeline/media) contre un serveur HTTP local + LocalStorage :
+upload, dédup par contenu, plafond de taille, erreurs, cache entre runs, doublon
+concurrent d'un upload en échec.
+
+  python -m scripts.bench.check_media
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+
+from scripts.pipeline.candidate import Candidate, TikTokSignals
+
+VIDEO = b"\x00\x00\x00\x18ftypmp42" + os.urandom(200_000)
+COVER = b"\xff\xd8\xff\xe0" + os.urandom(20_000)
+BIG = os.urandom(300_000)
+
+FILES: Dict[str, Tuple[bytes, str]] = {
+    "/v1.mp4": (VIDEO, "video/mp4"),
+    "/v1-repost.mp4?sig=2": (VIDEO, "video/mp4"),
+    "/c1.jpeg": (COVER, "image/jpeg"),
+    "/big.mp4": (BIG, "video/mp4"),
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    hits = 0
+
+    def do_GET(self) -> None:
+        type(self).hits += 1
+        body = FILES.get(self.path)
+        if body is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        data, ctype = body
+        self.send_response(200)
+        self.send_header("content-type", ctype)
+        # pas de Content-Length pour /big : le plafond doit couper en cours de flux
+        if self.path != "/big.mp4":
+            self.send_header("content-length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+
+class _FailingStorage:
+    def __init__(self, root: str, base_url: str) -> None:
+        from scripts.pipeline.media import LocalStorage
+
+        self.local = LocalStorage(root, base_url)
+        self.attempts = 0
+
+    def public_url(self, path: str) -> str:
+        return self.local.public_url(path)
+
+    async def exists(self, path: str) -> bool:
+        return False
+
+    async def upload(self, path: str, data: bytes, content_type: str) -> None:
+        self.attempts += 1
+        await asyncio.sleep(0.05)
+        raise RuntimeError("503 storage indisponible")
+
+
+def _winners(base: str) -> List[Candidate]:
+    def w(vid: str, video: str, cover: str = "") -> Candidate:
+        return Candidate(
+            title=f"produit {vid}",
+            tk=TikTokSignals(video_id=vid, video_storage_url=base + video, cover_url=(base + cover) if cover else None),
+        )
+
+    return [
+        w("1", "/v1.mp4", "/c1.jpeg"),
+        w("2", "/v1-repost.mp4?sig=2"),
+        w("3", "/big.mp4"),
+        w("4", "/missing.mp4"),
+    ]
+
+
+def main() -> None:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["PIPELINE_STATE_DIR"] = os.path.join(tmp, "state")
+        os.environ["MEDIA_MAX_VIDEO_BYTES"] = "250000"
+
+        from scripts.pipeline.media import LocalStorage, mirror_winner_media
+
+        storage = LocalStorage(os.path.join(tmp, "bucket"), "https://cdn.test/media")
+        winners = _winners(base)
+        stats = mirror_winner_media(winners, storage)
+        print("run 1:", stats)
+
+        assert stats["uploaded"] == 2 and stats["deduped"] == 1, stats
+        assert stats["too_large"] == 1 and stats["errors"] == 1, stats
+        assert storage.uploads == 2
+        assert winners[0].tk.video_storage_url == winners[1].tk.video_storage_url
+        assert winners[0].tk.video_storage_url.startswith("https://cdn.test/media/videos/")
+        assert winners[0].tk.video_storage_url.endswith(".mp4")
+        assert winners[0].image_url and winners[0].image_url.endswith(".jpg")
+        # échec : URL d'origine conservée
+        assert winners[2].tk.video_storage_url == base + "/big.mp4"
+        assert winners[3].tk.video_storage_url == base + "/missing.mp4"
+
+        # run suivant : sources déjà miroitées -> ni téléchargement ni upload
+        hits = _Handler.hits
+        again = _winners(base)
+        stats = mirror_winner_media(again, storage)
+        print("run 2:", stats)
+        assert stats["cached"] == 3 and stats["uploaded"] == 0, stats
+        assert _Handler.hits - hits == 2  # seuls les deux échecs sont retentés
+        assert again[0].image_url == winners[0].image_url
+
+        # upload en échec : le doublon concurrent attend le même upload, rien n'est indexé
+        failing = _FailingStorage(os.path.join(tmp, "bucket-ko"), "https://cdn.test/ko")
+        dupes = [
+            Candidate(title="produit 5", tk=TikTokSignals(video_id="5", video_storage_url=base + "/v1.mp4")),
+            Candidate(title="produit 6", tk=TikTokSignals(video_id="6", video_storage_url=base + "/v1-repost.mp4?sig=2")),
+        ]
+        stats = mirror_winner_media(dupes, failing)
+        print("run 3 (upload KO):", stats)
+        assert failing.attempts == 1 and stats["errors"] == 2 and stats["uploaded"] == 0, stats
+        assert [d.tk.video_storage_url for d in dupes] == [base + "/v1.mp4", base + "/v1-repost.mp4?sig=2"]
+        from scripts.pipeline.local_state import read_json
+        from scripts.pipeline.media import MEDIA_INDEX_FILE
+
+        index = read_json(MEDIA_INDEX_FILE, {})
+        assert "video:5" not in index and "video:6" not in index
+
+    server.shutdown()
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
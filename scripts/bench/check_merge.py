@@ -0,0 +1,67 @@
+"""
+Fusion des doublons (pipeline/merge) : métriques sommées, champs vidéo de la vidéo
+la plus vue (comparée vidéo contre vidéo, pas contre la somme du groupe), y compris
+après checkpoint et au second passage par slug.
+
+  python -m scripts.bench.check_merge
+"""
+
+from __future__ import annotations
+
+from typing import List
+
+from scripts.pipeline.candidate import Candidate, TikTokSignals
+from scripts.pipeline.merge import merge_by_key, merge_candidates
+
+
+def _video(vid: str, views: int, caption: str = "Mini mixeur portable #fyp", **tk: object) -> Candidate:
+    return Candidate(
+        title=caption,
+        tk=TikTokSignals(
+            video_id=vid,
+            video_url=f"https://www.tiktok.com/@u/video/{vid}",
+            created_at=f"2026-10-1{vid}T07:00:00Z",
+            duration_seconds=10 + int(vid),
+            views=views,
+            **tk,
+        ),
+    )
+
+
+def _roundtrip(items: List[Candidate]) -> List[Candidate]:
+    return [Candidate.from_dict(c.to_dict()) for c in items]
+
+
+def main() -> None:
+    # trois reposts : la troisième vidéo est la plus vue (500) sans dépasser la somme (100 + 450)
+    stats: dict = {}
+    merged = merge_candidates([_video("1", 100), _video("2", 450), _video("3", 500)], stats)
+    assert len(merged) == 1 and stats["reposts_collapsed"] == 2, stats
+    tk = merged[0].tk
+    print("3 vidéos:", {"views": tk.views, "lead": tk.video_id, "lead_views": tk.lead_views})
+    assert tk.views == 1050 and tk.video_count == 3
+    assert tk.video_id == "3" and tk.lead_views == 500
+    assert tk.created_at == "2026-10-13T07:00:00Z" and tk.duration_seconds == 13
+    assert len(tk.video_urls) == 3
+
+    # même vidéo revue sous un autre hashtag : la tête garde ses propres vues (max)
+    merged = merge_candidates([_video("1", 100), _video("2", 450), _video("2", 480, hashtag="gadgets")])
+    tk = merged[0].tk
+    assert tk.video_id == "2" and tk.lead_views == 480, tk
+
+    # second passage par slug, après checkpoint : un groupe fusionné compare sa vidéo de tête
+    a = merge_candidates([_video("1", 300, "Lampe coucher de soleil"), _video("2", 300, "lampe coucher de soleil !!")])
+    b = [_video("4", 400, "Sunset lamp #fyp")]
+    for c in a + b:
+        c.title = "lampe coucher de soleil"
+    final = merge_by_key(_roundtrip(a) + _roundtrip(b), lambda c: c.title)
+    tk = final[0].tk
+    print("second passage:", {"views": tk.views, "lead": tk.video_id, "lead_views": tk.lead_views})
+    assert tk.views == 1000 and tk.video_count == 3
+    assert tk.video_id == "4" and tk.lead_views == 400
+
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Équivalence score_candidate (scalaire, référence) vs scoring_np (vectorisé).
+
+  python -m scripts.bench.check_scoring --n 200000
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple, Union
+
+from scripts.bench.synthetic import BASE_TIME, synthetic_candidates
+from scripts.pipeline.candidate import Candidate
+from scripts.pipeline.scoring import ScoringContext, score_candidate
+from scripts.pipeline.scoring_np import score_candidates_batch
+
+
+def _edge_cases() -> List[Dict[str, Any]]:
+    def c(**tk: Any) -> Dict[str, Any]:
+        return {"title": "x", "signals": {"tiktok_hashtag": tk}}
+
+    return [
+        c(),
+        c(views=0, likes=10, shares=3, comments=1),
+        c(views="12", likes=None, shares="abc", created_at="not a date"),
+        c(views=100, likes=6, shares=1, duration_seconds=6, created_at="2026-10-17T07:00:00Z"),
+        c(views=100, likes=6, shares=1, duration_seconds=35, created_at="2026-10-17T07:00:00.000001Z"),
+        c(views=1, likes=1, shares=1, duration_seconds=-3, created_at="2030-01-01T00:00:00"),
+        c(views=10**9, likes=10**8, shares=10**7, comments=10**6, created_at="2020-01-01T00:00:00+02:00"),
+        c(views=5000, shares=40, created_at="2026-10-19T06:30:00Z"),
+        c(views=2_000_000, shares=9000, created_at="2026-01-01T00:00:00Z", views_per_hour=59.52, shares_per_hour=0.3),
+        c(views=800_000, shares=4000, views_per_hour=8928.57, shares_per_hour=None),
+        c(views=10, views_per_hour="n/a", shares_per_hour=12),
+        {"title": "no signals"},
+    ]
+
+
+def _result(c: Union[Candidate, Dict[str, Any]]) -> Tuple[Any, Any]:
+    if isinstance(c, Candidate):
+        return c.score, c.score_breakdown
+    return c["score"], c["score_breakdown"]
+
+
+def check(candidates: List[Union[Candidate, Dict[str, Any]]], now: datetime) -> int:
+    batch = copy.deepcopy(candidates)
+    max_views, max_likes, max_shares = score_candidates_batch(batch, ScoringContext(now, norm="log"))
+
+    # contexte séparé : le scalaire ne profite pas du cache de parsing du batch
+    ctx = ScoringContext(now, norm="log")
+
+    mismatches = 0
+    for ref_c, got in zip(candidates, batch):
+        ref = score_candidate(ref_c, max_views=max_views, max_likes=max_likes, max_shares=max_shares, ctx=ctx)
+        if (ref["score"], ref["score_breakdown"]) != _result(got):
+            mismatches += 1
+            if mismatches <= 5:
+                print("≠", ref, _result(got))
+    return mismatches
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=100_000)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    now = BASE_TIME.astimezone(timezone.utc)
+    records = synthetic_candidates(args.n, args.seed)
+    dicts = [c.to_dict() for c in records] + _edge_cases()
+
+    t0 = time.perf_counter()
+    bad = check(records, now) + check(dicts, now)
+    print(f"{len(records) + len(dicts)} candidats (records + dicts), {bad} écarts ({time.perf_counter() - t0:.1f}s)")
+    if bad:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Vignettes keyframes (pipeline/thumbnails) : mp4 synthétique servi en local avec Range,
+LocalStorage, keyframe la plus nette, WebP aux deux largeurs, cache par hash vidéo.
+
+  python -m scripts.bench.check_thumbnails
+"""
+
+from __future__ import annotations
+
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+import av
+import numpy as np
+from PIL import Image
+
+from scripts.pipeline.candidate import Candidate, TikTokSignals
+
+W, H, FPS, GOP = 720, 1280, 30, 15
+
+
+def synthetic_mp4(seconds: int = 4) -> bytes:
+    """
+    GOP de 15 frames ; keyframes floues (aplat) sauf la 3e (damier net).
+    """
+    # faststart (moov en tête, comme les mp4 TikTok) : réécriture du fichier -> pas de BytesIO
+    fd, path = tempfile.mkstemp(suffix=".mp4")
+    os.close(fd)
+    with av.open(path, mode="w", options={"movflags": "faststart"}) as out:
+        stream = out.add_stream("mpeg4", rate=FPS)
+        stream.width, stream.height, stream.pix_fmt = W, H, "yuv420p"
+        stream.codec_context.gop_size = GOP
+        yy, xx = np.mgrid[0:H, 0:W]
+        checker = (((yy // 8) + (xx // 8)) % 2 * 255).astype(np.uint8)
+        for i in range(seconds * FPS):
+            if i // GOP == 2:
+                img = np.stack([checker] * 3, axis=-1)
+            else:
+                img = np.full((H, W, 3), 40 + i % 20, dtype=np.uint8)
+            for packet in stream.encode(av.VideoFrame.from_ndarray(img, format="rgb24")):
+                out.mux(packet)
+        for packet in stream.encode():
+            out.mux(packet)
+    with open(path, "rb") as f:
+        data = f.read()
+    os.remove(path)
+    return data
+
+
+VIDEO = synthetic_mp4()
+FILES: Dict[str, bytes] = {"/v.mp4": VIDEO, "/broken.mp4": os.urandom(50_000)}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    requested: List[str] = []
+
+    def do_GET(self) -> None:
+        data = FILES.get(self.path.split("?")[0])
+        if data is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        rng = self.headers.get("Range") or ""
+        type(self).requested.append(rng)
+        if rng.startswith("bytes=0-"):
+            data = data[: int(rng[len("bytes=0-"):]) + 1]
+            self.send_response(206)
+        else:
+            self.send_response(200)
+        self.send_header("content-type", "video/mp4")
+        self.send_header("content-length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+
+def main() -> None:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["PIPELINE_STATE_DIR"] = os.path.join(tmp, "state")
+        os.environ["THUMB_RANGE_BYTES"] = str(len(VIDEO) * 3 // 4)  # fin de fichier jamais lue
+
+        from scripts.pipeline.media import LocalStorage
+        from scripts.pipeline.thumbnails import attach_thumbnails
+
+        storage = LocalStorage(os.path.join(tmp, "bucket"), "https://cdn.test/media")
+
+        def winners() -> List[Candidate]:
+            return [
+                Candidate(title="a", tk=TikTokSignals(video_storage_url=base + "/v.mp4")),
+                Candidate(title="a bis", tk=TikTokSignals(video_storage_url=base + "/v.mp4?sig=2")),
+                Candidate(title="b", tk=TikTokSignals(video_storage_url=base + "/broken.mp4")),
+                Candidate(title="c", tk=TikTokSignals()),
+            ]
+
+        t0 = time.perf_counter()
+        first = winners()
+        stats = attach_thumbnails(first, storage)
+        print(f"run 1: {stats} ({time.perf_counter() - t0:.2f}s, mp4 {len(VIDEO)} bytes)")
+        assert stats["extracted"] == 1 and stats["undecodable"] == 1, stats
+        assert all(r.startswith("bytes=0-") for r in _Handler.requested)
+        assert first[0].image_url and first[0].image_url == first[1].image_url
+        assert first[0].image_url.endswith("/320.webp") and first[0].image_source == "video_keyframe"
+        assert first[0].image_detail_url.endswith("/720.webp")
+        assert first[2].image_url is None and first[3].image_url is None
+
+        rel = first[0].image_url[len("https://cdn.test/media/"):]
+        small = Image.open(os.path.join(tmp, "bucket", rel))
+        large = Image.open(os.path.join(tmp, "bucket", first[0].image_detail_url[len("https://cdn.test/media/"):]))
+        assert small.format == "WEBP" and small.size == (320, 569) and large.size == (720, 1280)
+        # keyframe retenue = damier (la plus nette), pas un aplat
+        assert np.asarray(large.convert("L"), dtype=np.float32).std() > 60
+
+        # run suivant : index local -> aucune extraction ni upload
+        uploads = storage.uploads
+        again = winners()
+        stats = attach_thumbnails(again, storage)
+        print("run 2:", stats)
+        assert stats["extracted"] == 0 and stats["cached"] == 2 and storage.uploads == uploads, stats
+        assert again[0].image_url == first[0].image_url
+
+        # index local perdu : les vignettes déjà dans le bucket suffisent
+        os.remove(os.path.join(tmp, "state", "thumb_index.json"))
+        stats = attach_thumbnails(winners(), storage)
+        print("run 3 (sans index):", stats)
+        assert stats["extracted"] == 0 and storage.uploads == uploads, stats
+
+    server.shutdown()
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
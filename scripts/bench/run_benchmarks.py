@@ -0,0 +1,121 @@
+"""
+Benchmarks des étapes pur-Python du pipeline sur des signaux TikTok synthétiques.
+
+  python -m scripts.bench.run_benchmarks --sizes 1000,10000,100000,1000000 --out bench_results.json
+
+Chaque étape est chronométrée (meilleur de --repeat) pour chaque taille ; les résultats
+sont écrits en JSON pour comparer deux commits.
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import json
+import platform
+import subprocess
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Tuple
+
+from scripts.bench.synthetic import BASE_TIME, synthetic_candidates
+from scripts.pipeline.candidate import Candidate
+from scripts.pipeline.merge import merge_candidates
+from scripts.pipeline.scoring import ScoringContext, score_candidate
+from scripts.pipeline.scoring_np import score_candidates_batch
+from scripts.pipeline.text import canonical_caption
+from scripts.weekly_run_v3 import infer_category, make_tags
+
+
+def _timed(fn: Callable[[Any], Any], repeat: int, setup: Callable[[], Any]) -> float:
+    # setup() hors chrono, refait à chaque passe
+    best = float("inf")
+    for _ in range(repeat):
+        arg = setup()
+        t0 = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _score_scalar(candidates: List[Candidate]) -> None:
+    ctx = ScoringContext(BASE_TIME)
+    max_views = max([c.tk.views for c in candidates] + [1])
+    max_likes = max([c.tk.likes for c in candidates] + [1])
+    max_shares = max([c.tk.shares for c in candidates] + [1])
+    for c in candidates:
+        score_candidate(c, max_views=max_views, max_likes=max_likes, max_shares=max_shares, ctx=ctx)
+
+
+def _stages(titles: List[str]) -> Dict[str, Tuple[Callable[[List[Candidate]], Any], bool]]:
+    """
+    nom -> (étape, mute les candidats). Une étape qui mute (fusion : métriques sommées
+    sur le candidat de tête ; score) reçoit une copie profonde neuve à chaque passe.
+    """
+    return {
+        "canonical_caption": (lambda _: [canonical_caption(t) for t in titles], False),
+        "merge_candidates": (merge_candidates, True),
+        "score_candidate": (_score_scalar, True),
+        "score_candidates_batch": (lambda cs: score_candidates_batch(cs, ScoringContext(BASE_TIME, norm="log")), True),
+        "score_candidates_batch_rank": (lambda cs: score_candidates_batch(cs, ScoringContext(BASE_TIME, norm="rank")), True),
+        "infer_category": (lambda _: [infer_category(t) for t in titles], False),
+        "make_tags": (lambda _: [make_tags(t) for t in titles], False),
+    }
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return ""
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="1000,10000,100000,1000000")
+    ap.add_argument("--stages", default="", help="sous-ensemble d'étapes, séparées par des virgules")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--out", default="bench_results.json")
+    args = ap.parse_args()
+
+    sizes = [int(x) for x in args.sizes.split(",") if x.strip()]
+    only = {x.strip() for x in args.stages.split(",") if x.strip()}
+
+    results: List[Dict[str, Any]] = []
+    for n in sizes:
+        t0 = time.perf_counter()
+        base = synthetic_candidates(n, args.seed)
+        gen_s = time.perf_counter() - t0
+
+        for name, (fn, mutates) in _stages([c.title for c in base]).items():
+            if only and name not in only:
+                continue
+            # `base` n'est jamais modifié : chaque passe part des mêmes données
+            seconds = _timed(fn, args.repeat, lambda: copy.deepcopy(base) if mutates else base)
+            results.append({
+                "stage": name,
+                "n": n,
+                "seconds": round(seconds, 6),
+                "per_item_us": round(seconds / max(n, 1) * 1e6, 3),
+            })
+            print(f"{name:<24} n={n:<9} {seconds:9.4f}s  {seconds / max(n, 1) * 1e6:8.3f} µs/item")
+
+        print(f"{'(génération)':<24} n={n:<9} {gen_s:9.4f}s")
+
+    payload = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "git_rev": _git_rev(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+    print(f"→ {args.out}")
+
+
+if __name__ == "__main__":
+    main()
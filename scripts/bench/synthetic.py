@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+# Générateurs déterministes d'items au format dataset Apify (clockworks/tiktok-hashtag-scraper).
+# item i ne dépend que de (seed, i) : on peut servir une page sans matérialiser tout le dataset.
+
+PRODUCTS_FR = [
+    "brosse nettoyante visage", "mini mixeur portable", "lampe led coucher de soleil",
+    "organisateur de placard", "gourde isotherme", "support téléphone voiture",
+    "brosse pour chat", "veilleuse bébé", "coupe légumes spirale", "masque cheveux",
+    "ceinture de gainage", "aspirateur sans fil", "écouteurs bluetooth", "boîte lunch box",
+]
+PRODUCTS_EN = [
+    "cleaning gel for car", "portable blender", "sunset lamp", "closet organizer",
+    "posture corrector", "pet hair remover", "ice roller", "magnetic phone mount",
+    "heatless curler", "mini projector", "air fryer liners", "lint remover",
+]
+HOOKS_FR = [
+    "J'ai craqué pour", "Franchement ce", "Le meilleur achat de l'année :", "Vous m'avez demandé le",
+    "Testé et approuvé :", "Je comprends enfin pourquoi tout le monde veut ce",
+]
+HOOKS_EN = [
+    "TikTok made me buy this", "Obsessed with this", "Best purchase ever:", "You asked for the",
+    "This changed my routine:", "I can't believe this",
+]
+TAILS = ["", " lien en bio", " link in bio", " 🔗 en bio", " (code promo en bio)", "!!!", " 😍😍", " ✨"]
+EMOJIS = ["😍", "🔥", "✨", "💯", "🛒", "😱", "🤯", "👀", "❤️", "🙌"]
+HASHTAGS = [
+    "tiktokmademebuyit", "amazonfinds", "viralproducts", "tiktokshopfinds", "gadgets",
+    "pourtoi", "fyp", "astuce", "maison", "beauty", "musthave",
+]
+SEARCH_HASHTAGS = ["tiktokmademebuyit", "amazonfinds", "viralproducts", "tiktokshopfinds", "gadgets"]
+
+BASE_TIME = datetime(2026, 10, 19, 7, 0, tzinfo=timezone.utc)
+
+
+def _rng(seed: int, i: int) -> random.Random:
+    return random.Random(seed * 1_000_003 + i)
+
+
+def synthetic_caption(r: random.Random) -> str:
+    if r.random() < 0.6:
+        text = f"{r.choice(HOOKS_FR)} {r.choice(PRODUCTS_FR)}"
+    else:
+        text = f"{r.choice(HOOKS_EN)} {r.choice(PRODUCTS_EN)}"
+
+    parts = [text]
+    for _ in range(r.randint(0, 3)):
+        parts.append(r.choice(EMOJIS))
+    if r.random() < 0.3:
+        parts.append(f"@user{r.randint(1, 500)}")
+    parts.append(r.choice(TAILS))
+    for _ in range(r.randint(1, 6)):
+        parts.append(f"#{r.choice(HASHTAGS)}")
+    return " ".join(p for p in parts if p)
+
+
+def synthetic_metrics(r: random.Random) -> Dict[str, int]:
+    # vues à queue lourde (lognormale), likes/partages/commentaires corrélés aux vues
+    views = int(min(r.lognormvariate(11.0, 1.8), 500_000_000))
+    like_rate = min(max(r.gauss(0.05, 0.025), 0.001), 0.3)
+    likes = int(views * like_rate)
+    shares = int(likes * min(max(r.gauss(0.08, 0.05), 0.0), 0.6))
+    comments = int(likes * min(max(r.gauss(0.02, 0.01), 0.0), 0.2))
+    return {"views": views, "likes": likes, "shares": shares, "comments": comments}
+
+
+def synthetic_apify_item(seed: int, i: int, with_media: bool = False) -> Dict[str, Any]:
+    r = _rng(seed, i)
+    m = synthetic_metrics(r)
+    video_id = str(7_300_000_000_000_000_000 + seed * 10_000_000 + i)
+    author = f"creator{r.randint(1, 5000)}"
+    created = BASE_TIME - timedelta(seconds=r.randint(0, 150 * 86400))
+
+    return {
+        "id": video_id,
+        "text": synthetic_caption(r),
+        "mediaUrls": [f"https://api.apify.com/v2/key-value-stores/stub/records/video-{video_id}.mp4"] if with_media else [],
+        "diggCount": m["likes"],
+        "shareCount": m["shares"],
+        "playCount": m["views"],
+        "commentCount": m["comments"],
+        "authorMeta": {"name": author, "nickName": author.title(), "verified": False, "fans": r.randint(0, 10**6)},
+        "createTimeISO": created.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+        "videoMeta": {"duration": r.randint(5, 90), "height": 1024, "width": 576,
+                      "coverUrl": f"https://p16-sign.tiktokcdn.com/stub/{video_id}.jpeg"},
+        "webVideoUrl": f"https://www.tiktok.com/@{author}/video/{video_id}",
+        "searchHashtag": {"name": SEARCH_HASHTAGS[i % len(SEARCH_HASHTAGS)], "views": 10**9},
+        # champs ignorés par le pipeline (poids réaliste des items complets)
+        "musicMeta": {"musicName": "son original", "musicAuthor": author, "playUrl": "https://example.invalid/m.mp3"},
+        "hashtags": [{"name": h} for h in r.sample(HASHTAGS, 3)],
+        "isAd": False,
+        "collectCount": int(m["likes"] * 0.1),
+    }
+
+
+def synthetic_apify_items(n: int, seed: int = 1, with_media: bool = False) -> List[Dict[str, Any]]:
+    return [synthetic_apify_item(seed, i, with_media) for i in range(n)]
+
+
+def synthetic_candidates(n: int, seed: int = 1) -> List[Any]:
+    """
+    Candidats au format de fetch_tiktok_candidates_from_hashtags (vues à queue lourde,
+    likes/partages corrélés, captions FR/EN avec emojis et hashtags).
+    """
+    from scripts.connectors.tiktok_hashtag_apify import candidates_from_items
+
+    return candidates_from_items(synthetic_apify_items(n, seed))
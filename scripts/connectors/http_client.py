@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import os
+import random
+import threading
+import time
+from typing import Any, Dict
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import httpx  # optionnel : HTTP/2 (pip install "httpx[http2]")
+except ImportError:
+    httpx = None
+
+UA = (
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121 Safari/537.36"
+)
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# POST non rejoué : un POST /acts/.../runs relancé = un run Apify payé en double
+IDEMPOTENT_METHODS = frozenset(["GET", "HEAD", "OPTIONS", "PUT", "DELETE"])
+
+
+def _retries() -> int:
+    return int(os.environ.get("HTTP_RETRIES") or "3")
+
+
+def _backoff_seconds() -> float:
+    return float(os.environ.get("HTTP_BACKOFF_SECONDS") or "0.5")
+
+
+def _default_timeout() -> float:
+    return float(os.environ.get("HTTP_TIMEOUT_SECONDS") or "30")
+
+
+def _pool_size() -> int:
+    return int(os.environ.get("HTTP_POOL_SIZE") or "10")
+
+
+def _use_http2() -> bool:
+    return (os.environ.get("HTTP2") or "").strip() == "1" and httpx is not None
+
+
+# =============================================================================
+# SESSIONS (une par host, keep-alive)
+# =============================================================================
+
+_lock = threading.Lock()
+_sessions: Dict[str, requests.Session] = {}
+_h2_clients: Dict[str, Any] = {}
+_stats: Dict[str, Dict[str, float]] = {}
+
+
+def _host(url: str) -> str:
+    return urlsplit(url).netloc.lower()
+
+
+def get_session(url: str) -> requests.Session:
+    """
+    Session requests poolée pour le host de `url` (retries 429/5xx avec backoff).
+    À utiliser directement pour le streaming (stream=True).
+    """
+    host = _host(url)
+    with _lock:
+        s = _sessions.get(host)
+        if s is None:
+            retry = Retry(
+                total=_retries(),
+                backoff_factor=_backoff_seconds(),
+                status_forcelist=RETRY_STATUSES,
+                allowed_methods=IDEMPOTENT_METHODS,
+                respect_retry_after_header=True,
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=_pool_size(), max_retries=retry)
+            s = requests.Session()
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            s.headers["User-Agent"] = UA
+            _sessions[host] = s
+    return s
+
+
+def _h2_client(url: str) -> Any:
+    host = _host(url)
+    with _lock:
+        c = _h2_clients.get(host)
+        if c is None:
+            c = httpx.Client(
+                http2=True,
+                headers={"User-Agent": UA},
+                follow_redirects=True,
+                limits=httpx.Limits(max_keepalive_connections=_pool_size()),
+            )
+            _h2_clients[host] = c
+    return c
+
+
+def _h2_request(method: str, url: str, timeout: float, **kwargs: Any) -> Any:
+    client = _h2_client(url)
+    retries = _retries() if method.upper() in IDEMPOTENT_METHODS else 0
+
+    for attempt in range(retries + 1):
+        r = client.request(method, url, timeout=timeout, **kwargs)
+        if r.status_code not in RETRY_STATUSES or attempt >= retries:
+            return r
+
+        wait = _backoff_seconds() * (2 ** attempt) + random.random() * 0.1
+        retry_after = r.headers.get("retry-after")
+        if retry_after and retry_after.isdigit():
+            wait = max(wait, float(retry_after))
+        time.sleep(wait)
+
+    return r
+
+
+# =============================================================================
+# REQUESTS
+# =============================================================================
+
+def _record(url: str, elapsed: float, ok: bool) -> None:
+    host = _host(url)
+    with _lock:
+        st = _stats.setdefault(host, {"requests": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0})
+        ms = elapsed * 1000.0
+        st["requests"] += 1
+        st["total_ms"] += ms
+        st["max_ms"] = max(st["max_ms"], ms)
+        if not ok:
+            st["errors"] += 1
+
+
+def request(method: str, url: str, timeout: Any = None, **kwargs: Any) -> Any:
+    """
+    Requête HTTP via le pool partagé.
+    Retourne un requests.Response (ou httpx.Response si HTTP2=1) : status_code / json() / text / raise_for_status().
+    """
+    timeout = timeout if timeout is not None else _default_timeout()
+    t0 = time.perf_counter()
+    ok = False
+    try:
+        if _use_http2() and not kwargs.get("stream"):
+            r = _h2_request(method, url, timeout=timeout, **kwargs)
+        else:
+            r = get_session(url).request(method, url, timeout=timeout, **kwargs)
+        ok = r.status_code < 400
+        return r
+    finally:
+        _record(url, time.perf_counter() - t0, ok)
+
+
+def get(url: str, **kwargs: Any) -> Any:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs: Any) -> Any:
+    return request("POST", url, **kwargs)
+
+
+def http_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Compteurs par host pour le rapport de run.
+    """
+    with _lock:
+        out: Dict[str, Dict[str, Any]] = {}
+        for host, st in _stats.items():
+            n = int(st["requests"]) or 1
+            out[host] = {
+                "requests": int(st["requests"]),
+                "errors": int(st["errors"]),
+                "avg_ms": round(st["total_ms"] / n, 1),
+                "max_ms": round(st["max_ms"], 1),
+            }
+        return out
@@ -1,17 +1,43 @@
 from __future__ import annotations
 
+import hashlib
+import json
 import os
 import time
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 from urllib.parse import quote
-import requests
+
+from scripts.connectors import http_client
+from scripts.pipeline.candidate import Candidate, TikTokSignals
+from scripts.pipeline.local_state import read_json, write_json
 
 APIFY_API_BASE = "https://api.apify.com/v2"
 
-UA = (
-    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
-    "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121 Safari/537.36"
-)
+# Seuls champs lus par le pipeline (paramètre `fields` du dataset Apify).
+# authorMeta / videoMeta sont gardés entiers (on n'en lit que name / duration / coverUrl).
+DATASET_FIELDS = [
+    "id",
+    "text",
+    "mediaUrls",
+    "diggCount",
+    "shareCount",
+    "playCount",
+    "commentCount",
+    "authorMeta",
+    "createTimeISO",
+    "videoMeta",
+    "webVideoUrl",
+    "searchHashtag",
+]
+
+VIDEO_FIELDS = ["id", "webVideoUrl", "mediaUrls"]
+
+RUN_CACHE_FILE = "apify_runs.json"
+
+
+def _api_base() -> str:
+    # surchargeable pour pointer sur le stub local (scripts/bench/apify_stub.py)
+    return (os.environ.get("APIFY_API_BASE") or APIFY_API_BASE).rstrip("/")
 
 
 def _apify_token() -> str:
@@ -50,20 +76,95 @@ def _limit_total() -> int:
     return int(os.environ.get("TIKTOK_VIDEOS_LIMIT") or "250")
 
 
-def run_actor_and_get_items(actor_id: str, input_payload: Dict[str, Any]) -> List[Dict[str, Any]]:
-    token = _apify_token()
+def _poll_seconds() -> float:
+    return float(os.environ.get("APIFY_POLL_SECONDS") or "3")
+
+
+def _dataset_page_size() -> int:
+    return int(os.environ.get("APIFY_DATASET_PAGE_SIZE") or "1000")
+
+
+def _video_download_mode() -> str:
+    """
+    lazy  : pas de téléchargement au scrape, 2e run Apify uniquement pour les winners (défaut)
+    eager : shouldDownloadVideos sur tout le scrape (ancien comportement)
+    off   : jamais de mp4
+    """
+    mode = (os.environ.get("TIKTOK_VIDEO_DOWNLOAD") or "lazy").strip().lower()
+    return mode if mode in ("lazy", "eager", "off") else "lazy"
+
+
+def _video_actor_id() -> str:
+    # l'actor hashtag ne prend pas d'URLs de posts -> actor TikTok générique
+    return (os.environ.get("APIFY_VIDEO_ACTOR_ID") or "clockworks/tiktok-scraper").strip()
+
+
+def _run_cache_max_age() -> int:
+    # 0 = cache désactivé
+    return int(os.environ.get("APIFY_RUN_CACHE_MAX_AGE_SECONDS") or "21600")
+
+
+def _run_cache_key(actor_id: str, input_payload: Dict[str, Any]) -> str:
+    canonical = json.dumps(input_payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(f"{actor_id}\n{canonical}".encode("utf-8")).hexdigest()
+
+
+def _cached_dataset_id(cache_key: str, token: str) -> Optional[str]:
+    """
+    Dataset d'un run identique (même actor + même input) encore frais et toujours disponible.
+    """
+    max_age = _run_cache_max_age()
+    if max_age <= 0:
+        return None
+
+    entry = (read_json(RUN_CACHE_FILE, {}) or {}).get(cache_key)
+    if not entry or time.time() - float(entry.get("finished_at") or 0) > max_age:
+        return None
+
+    dataset_id = entry.get("dataset_id")
+    if not dataset_id:
+        return None
+
+    try:
+        r = http_client.get(f"{_api_base()}/datasets/{dataset_id}?token={token}", timeout=30)
+    except Exception:
+        return None
+
+    if r.status_code != 200:
+        return None
+
+    print(f"♻️ Apify run réutilisé: {entry.get('run_id')} (dataset {dataset_id})")
+    return dataset_id
+
+
+def _remember_run(cache_key: str, actor_id: str, run: Dict[str, Any]) -> None:
+    cache = read_json(RUN_CACHE_FILE, {}) or {}
+    max_age = _run_cache_max_age()
+    now = time.time()
+
+    # purge des entrées expirées pour que le fichier ne grossisse pas indéfiniment
+    cache = {k: v for k, v in cache.items() if now - float(v.get("finished_at") or 0) <= max_age}
+    cache[cache_key] = {
+        "actor_id": actor_id,
+        "run_id": run.get("id"),
+        "dataset_id": run.get("defaultDatasetId"),
+        "finished_at": now,
+    }
+    write_json(RUN_CACHE_FILE, cache)
+
+
+def _start_run_and_wait(actor_id: str, input_payload: Dict[str, Any], token: str) -> Dict[str, Any]:
     actor_id_enc = quote(actor_id, safe="")
 
-    r = requests.post(
-        f"{APIFY_API_BASE}/acts/{actor_id_enc}/runs?token={token}",
+    r = http_client.post(
+        f"{_api_base()}/acts/{actor_id_enc}/runs?token={token}",
         json=input_payload,
         timeout=30,
-        headers={"User-Agent": UA},
     )
 
     if r.status_code == 404:
         raise RuntimeError(
-            f"Apify 404 Actor.\nActor: {actor_id}\nURL: {APIFY_API_BASE}/acts/{actor_id_enc}/runs\n{r.text[:200]}"
+            f"Apify 404 Actor.\nActor: {actor_id}\nURL: {_api_base()}/acts/{actor_id_enc}/runs\n{r.text[:200]}"
         )
 
     r.raise_for_status()
@@ -78,10 +179,9 @@ def run_actor_and_get_items(actor_id: str, input_payload: Dict[str, Any]) -> Lis
     status = "RUNNING"
 
     while time.time() < deadline:
-        rr = requests.get(
-            f"{APIFY_API_BASE}/actor-runs/{run_id}?token={token}",
+        rr = http_client.get(
+            f"{_api_base()}/actor-runs/{run_id}?token={token}",
             timeout=30,
-            headers={"User-Agent": UA},
         )
 
         rr.raise_for_status()
@@ -93,27 +193,73 @@ def run_actor_and_get_items(actor_id: str, input_payload: Dict[str, Any]) -> Lis
             run = data
             break
 
-        time.sleep(3)
+        time.sleep(_poll_seconds())
 
     if status != "SUCCEEDED":
         raise RuntimeError(f"Apify run non réussi: {status}")
 
-    dataset_id = run.get("defaultDatasetId")
+    return run
 
-    if not dataset_id:
-        raise RuntimeError("Apify defaultDatasetId introuvable")
 
-    it = requests.get(
-        f"{APIFY_API_BASE}/datasets/{dataset_id}/items?token={token}&clean=true",
-        timeout=60,
-        headers={"User-Agent": UA},
-    )
+def _dataset_items(dataset_id: str, token: str, fields: Optional[List[str]]) -> List[Dict[str, Any]]:
+    page_size = _dataset_page_size()
+    params: Dict[str, Any] = {"clean": "true", "limit": page_size}
+    if fields:
+        params["fields"] = ",".join(fields)
+
+    items: List[Dict[str, Any]] = []
+    offset = 0
+
+    while True:
+        it = http_client.get(
+            f"{_api_base()}/datasets/{dataset_id}/items?token={token}",
+            params={**params, "offset": offset},
+            timeout=60,
+        )
+
+        it.raise_for_status()
+
+        page = it.json()
+        if not isinstance(page, list):
+            break
 
-    it.raise_for_status()
+        items.extend(page)
+
+        # clean=true (skipEmpty/skipHidden) : une page peut revenir plus courte que `limit`
+        # alors que la suite existe -> on avance de `limit` et on s'arrête sur le total
+        # annoncé (X-Apify-Pagination-Total), à défaut sur une page vide.
+        offset += page_size
+        total = it.headers.get("X-Apify-Pagination-Total")
+        if total is not None and str(total).isdigit():
+            if offset >= int(total):
+                break
+        elif not page:
+            break
+
+    return items
+
+
+def run_actor_and_get_items(
+    actor_id: str,
+    input_payload: Dict[str, Any],
+    fields: Optional[List[str]] = None,
+) -> List[Dict[str, Any]]:
+    token = _apify_token()
+    cache_key = _run_cache_key(actor_id, input_payload)
 
-    items = it.json()
+    dataset_id = _cached_dataset_id(cache_key, token)
 
-    return items if isinstance(items, list) else []
+    if not dataset_id:
+        run = _start_run_and_wait(actor_id, input_payload, token)
+        dataset_id = run.get("defaultDatasetId")
+
+        if not dataset_id:
+            raise RuntimeError("Apify defaultDatasetId introuvable")
+
+        if _run_cache_max_age() > 0:
+            _remember_run(cache_key, actor_id, run)
+
+    return _dataset_items(dataset_id, token, fields)
 
 
 def fetch_tiktok_hashtag_videos() -> List[Dict[str, Any]]:
@@ -122,19 +268,20 @@ def fetch_tiktok_hashtag_videos() -> List[Dict[str, Any]]:
     input_payload = {
         "hashtags": _hashtags(),
         "maxPostsPerHashtag": _max_posts_per_hashtag(),
-        "shouldDownloadVideos": True,  # ✅ IMPORTANT pour avoir mediaUrls
+        # mp4 téléchargés seulement pour les winners (cf. attach_winner_videos)
+        "shouldDownloadVideos": _video_download_mode() == "eager",
     }
 
-    items = run_actor_and_get_items(actor_id, input_payload)
+    items = run_actor_and_get_items(actor_id, input_payload, fields=DATASET_FIELDS)
 
     return items[:_limit_total()]
 
 
-def fetch_tiktok_candidates_from_hashtags() -> List[Dict[str, Any]]:
-
-    videos = fetch_tiktok_hashtag_videos()
-
-    out: List[Dict[str, Any]] = []
+def candidates_from_items(videos: List[Dict[str, Any]]) -> List[Candidate]:
+    """
+    Items dataset Apify -> candidats pipeline (dédupliqués par vidéo).
+    """
+    out: List[Candidate] = []
     seen = set()
 
     for v in videos:
@@ -144,17 +291,24 @@ def fetch_tiktok_candidates_from_hashtags() -> List[Dict[str, Any]]:
 
         caption = str(v.get("text") or "").strip()
 
-        # ✅ URL mp4 stable depuis Apify storage
+        # ✅ URL mp4 stable depuis Apify storage (vide en mode lazy)
         media_urls = v.get("mediaUrls") or []
         mp4_url = str(media_urls[0]).strip() if media_urls else ""
 
-        if not caption or not mp4_url:
+        web_url = v.get("webVideoUrl")
+        video_id = str(v.get("id") or "").strip()
+
+        search_hashtag = v.get("searchHashtag") or {}
+        hashtag = search_hashtag.get("name") if isinstance(search_hashtag, dict) else None
+
+        if not caption or not (mp4_url or web_url):
             continue
 
-        if mp4_url in seen:
+        key = video_id or web_url or mp4_url
+        if key in seen:
             continue
 
-        seen.add(mp4_url)
+        seen.add(key)
 
         likes = int(v.get("diggCount") or 0)
         shares = int(v.get("shareCount") or 0)
@@ -168,31 +322,80 @@ def fetch_tiktok_candidates_from_hashtags() -> List[Dict[str, Any]]:
 
         video_meta = v.get("videoMeta") or {}
         duration = video_meta.get("duration")
-
-        web_url = v.get("webVideoUrl")
+        cover_url = video_meta.get("coverUrl") or None
 
         out.append(
-            {
-                "title": caption,
-                "sources": ["tiktok_hashtag"],
-
-                # optionnel mais pratique
-                "video_storage_url": mp4_url,
-
-                "signals": {
-                    "tiktok_hashtag": {
-                        "video_url": web_url,
-                        "video_storage_url": mp4_url,  # ✅ utilisé par weekly_run_v3
-                        "author": author,
-                        "created_at": created,
-                        "duration_seconds": duration,
-                        "views": views,
-                        "likes": likes,
-                        "comments": comments,
-                        "shares": shares,
-                    }
-                },
-            }
+            Candidate(
+                title=caption,
+                tk=TikTokSignals(
+                    video_id=video_id or None,
+                    hashtag=hashtag,
+                    video_url=web_url,
+                    video_storage_url=mp4_url or None,  # ✅ utilisé par weekly_run_v3
+                    author=author,
+                    created_at=created,
+                    duration_seconds=duration,
+                    cover_url=cover_url,
+                    views=views,
+                    likes=likes,
+                    comments=comments,
+                    shares=shares,
+                ),
+            )
         )
 
-    return out
\ No newline at end of file
+    return out
+
+
+def fetch_tiktok_candidates_from_hashtags() -> List[Candidate]:
+    return candidates_from_items(fetch_tiktok_hashtag_videos())
+
+
+def attach_winner_videos(winners: List[Candidate]) -> int:
+    """
+    2e phase (lazy) : télécharge les mp4 uniquement pour les winners sans video_storage_url.
+    Met à jour les candidats en place, retourne le nombre de vidéos rattachées.
+    Un échec ici ne doit pas faire tomber le run (les produits restent publiables sans vidéo).
+    """
+    if _video_download_mode() != "lazy":
+        return 0
+
+    todo: Dict[str, Candidate] = {}
+    for w in winners:
+        if w.tk.video_url and not w.tk.video_storage_url:
+            todo[w.tk.video_url] = w
+
+    if not todo:
+        return 0
+
+    input_payload = {
+        "postURLs": list(todo.keys()),
+        "shouldDownloadVideos": True,
+    }
+
+    try:
+        items = run_actor_and_get_items(_video_actor_id(), input_payload, fields=VIDEO_FIELDS)
+    except Exception as e:
+        print("⚠️ attach_winner_videos:", e)
+        return 0
+
+    by_id = {str(w.tk.video_id): w for w in todo.values() if w.tk.video_id}
+
+    attached = 0
+    for v in items:
+        if not isinstance(v, dict):
+            continue
+
+        media_urls = v.get("mediaUrls") or []
+        mp4_url = str(media_urls[0]).strip() if media_urls else ""
+        if not mp4_url:
+            continue
+
+        w = by_id.get(str(v.get("id") or "")) or todo.get(v.get("webVideoUrl") or "")
+        if w is None:
+            continue
+
+        w.tk.video_storage_url = mp4_url
+        attached += 1
+
+    return attached
@@ -5,11 +5,13 @@ import json
 import time
 import random
 import re
-import unicodedata
+import threading
 from typing import Any, Dict, List, Optional
 
 from openai import OpenAI, InternalServerError, RateLimitError, APITimeoutError
 
+from scripts.pipeline.text import product_slug
+
 # =============================================================================
 # CONFIG
 # =============================================================================
@@ -43,14 +45,40 @@ def _sleep_backoff(attempt: int) -> None:
     time.sleep(base + random.random())
 
 
+# compteurs d'usage pour le rapport de run (appels concurrents -> verrou)
+_usage_lock = threading.Lock()
+_usage: Dict[str, int] = {"calls": 0, "retries": 0, "failures": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+
+def _count_usage(resp: Any) -> None:
+    u = getattr(resp, "usage", None)
+    with _usage_lock:
+        _usage["calls"] += 1
+        _usage["prompt_tokens"] += int(getattr(u, "prompt_tokens", 0) or 0)
+        _usage["completion_tokens"] += int(getattr(u, "completion_tokens", 0) or 0)
+
+
+def llm_usage() -> Dict[str, int]:
+    with _usage_lock:
+        out = dict(_usage)
+    out["total_tokens"] = out["prompt_tokens"] + out["completion_tokens"]
+    return out
+
+
 def _chat_with_retry(**kwargs):
     last_error: Optional[Exception] = None
     for attempt in range(6):
         try:
-            return client.chat.completions.create(**kwargs)
+            resp = client.chat.completions.create(**kwargs)
+            _count_usage(resp)
+            return resp
         except (InternalServerError, RateLimitError, APITimeoutError) as e:
             last_error = e
+            with _usage_lock:
+                _usage["retries"] += 1
             _sleep_backoff(attempt)
+    with _usage_lock:
+        _usage["failures"] += 1
     raise last_error  # type: ignore[misc]
 
 
@@ -135,14 +163,6 @@ def _uniq_keep_order(items: List[str]) -> List[str]:
     return out
 
 
-def _slugify(text: str) -> str:
-    text = _clean_str(text).lower()
-    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
-    text = re.sub(r"[^a-z0-9]+", "-", text)
-    text = re.sub(r"-{2,}", "-", text).strip("-")
-    return text[:120]
-
-
 def _contains_french_markers(text: str) -> bool:
     t = f" {_clean_str(text).lower()} "
     markers = [
@@ -1247,7 +1267,7 @@ def enrich_product_payload(product_payload: Dict[str, Any], geo: str = "FR") ->
     return {
         **product_payload,
         "title": title,
-        "slug": _slugify(_clean_str(product_payload.get("slug")) or title),
+        "slug": product_slug(_clean_str(product_payload.get("slug")) or title),
         "category": context["category"],
         "tags": context["tags"],
         "summary": summary,
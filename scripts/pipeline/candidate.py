@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+
+def _int(x: Any) -> int:
+    try:
+        return int(x or 0)
+    except Exception:
+        return 0
+
+
+def _float_or_none(x: Any) -> Optional[float]:
+    if x is None:
+        return None
+    try:
+        return float(x)
+    except Exception:
+        return None
+
+
+@dataclass(slots=True)
+class TikTokSignals:
+    """
+    Signaux TikTok d'une vidéo, ou d'un produit vu sur plusieurs vidéos (cf. merge) :
+    métriques sommées, champs vidéo = vidéo la plus vue, video_urls = toutes les vidéos.
+    to_dict() = forme stockée dans products.signals["tiktok_hashtag"].
+    """
+    video_id: Optional[str] = None
+    hashtag: Optional[str] = None
+    video_url: Optional[str] = None
+    video_storage_url: Optional[str] = None
+    author: Optional[str] = None
+    created_at: Optional[str] = None
+    duration_seconds: Optional[int] = None
+    cover_url: Optional[str] = None
+    views: int = 0
+    likes: int = 0
+    comments: int = 0
+    shares: int = 0
+    # vélocité depuis le snapshot du run précédent (cf. pipeline/velocity) ; None = pas de vélocité
+    views_per_hour: Optional[float] = None
+    shares_per_hour: Optional[float] = None
+    video_count: int = 1
+    video_urls: List[str] = field(default_factory=list)
+    # vues de la vidéo de tête seule (groupe fusionné) ; None = une seule vidéo (= views)
+    lead_views: Optional[int] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "video_id": self.video_id,
+            "hashtag": self.hashtag,
+            "video_url": self.video_url,
+            "video_storage_url": self.video_storage_url,
+            "author": self.author,
+            "created_at": self.created_at,
+            "duration_seconds": self.duration_seconds,
+            "cover_url": self.cover_url,
+            "views": self.views,
+            "likes": self.likes,
+            "comments": self.comments,
+            "shares": self.shares,
+            "views_per_hour": self.views_per_hour,
+            "shares_per_hour": self.shares_per_hour,
+            "video_count": self.video_count,
+            "video_urls": list(self.video_urls),
+            "lead_views": self.lead_views,
+        }
+
+    @classmethod
+    def from_dict(cls, d: Optional[Dict[str, Any]]) -> "TikTokSignals":
+        d = d or {}
+        duration = d.get("duration_seconds")
+        vph = _float_or_none(d.get("views_per_hour"))
+        return cls(
+            video_id=d.get("video_id"),
+            hashtag=d.get("hashtag"),
+            video_url=d.get("video_url"),
+            video_storage_url=d.get("video_storage_url"),
+            author=d.get("author"),
+            created_at=d.get("created_at"),
+            duration_seconds=_int(duration) if duration is not None else None,
+            cover_url=d.get("cover_url"),
+            views=_int(d.get("views")),
+            likes=_int(d.get("likes")),
+            comments=_int(d.get("comments")),
+            shares=_int(d.get("shares")),
+            views_per_hour=vph,
+            shares_per_hour=_float_or_none(d.get("shares_per_hour")) if vph is not None else None,
+            video_count=max(_int(d.get("video_count")), 1),
+            video_urls=[str(u) for u in d.get("video_urls") or [] if u],
+            lead_views=_int(d.get("lead_views")) if d.get("lead_views") is not None else None,
+        )
+
+
+@dataclass(slots=True)
+class Candidate:
+    """
+    Candidat du pipeline. `title` = caption brute jusqu'à l'extraction, puis nom produit.
+    Conversion en dict (forme historique) uniquement aux frontières : LLM, upsert, checkpoints.
+    """
+    title: str
+    tk: TikTokSignals
+    sources: List[str] = field(default_factory=lambda: ["tiktok_hashtag"])
+    score: int = 0
+    score_breakdown: Dict[str, Any] = field(default_factory=dict)
+    category: str = "autre"
+    tags: List[str] = field(default_factory=list)
+    # vignette hébergée chez nous (cf. pipeline/media)
+    image_url: Optional[str] = None
+    # grande largeur pour la fiche produit (vignette keyframe ; sinon = image_url)
+    image_detail_url: Optional[str] = None
+    image_source: Optional[str] = None
+
+    def signals(self) -> Dict[str, Any]:
+        return {"tiktok_hashtag": self.tk.to_dict()}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "title": self.title,
+            "sources": list(self.sources),
+            "video_storage_url": self.tk.video_storage_url,
+            "signals": self.signals(),
+            "score": self.score,
+            "score_breakdown": self.score_breakdown,
+            "category": self.category,
+            "tags": list(self.tags),
+            "image_url": self.image_url,
+            "image_detail_url": self.image_detail_url,
+            "image_source": self.image_source,
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "Candidate":
+        return cls(
+            title=str(d.get("title") or ""),
+            tk=TikTokSignals.from_dict((d.get("signals") or {}).get("tiktok_hashtag")),
+            sources=list(d.get("sources") or ["tiktok_hashtag"]),
+            score=_int(d.get("score")),
+            score_breakdown=dict(d.get("score_breakdown") or {}),
+            category=str(d.get("category") or "autre"),
+            tags=list(d.get("tags") or []),
+            image_url=d.get("image_url"),
+            image_detail_url=d.get("image_detail_url"),
+            image_source=d.get("image_source"),
+        )
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from scripts.pipeline.local_state import state_dir
+
+# Checkpoints d'un run (run_date, région) dans le dossier d'état local :
+#   checkpoints/<run_date>_<region>/<stage>.jsonl.gz   un record JSON par ligne
+#   checkpoints/<run_date>_<region>/stages.json        étapes terminées + méta
+# Une étape n'est "terminée" qu'une fois marquée dans stages.json (écrit après le .jsonl.gz).
+# Les étapes en append (analyses) sont relues telles quelles, ligne tronquée finale ignorée.
+
+CHECKPOINT_DIR = "checkpoints"
+
+
+def checkpoints_keep() -> bool:
+    return (os.environ.get("CHECKPOINT_KEEP") or "0").strip() == "1"
+
+
+def _root() -> Path:
+    return state_dir() / CHECKPOINT_DIR
+
+
+def latest_unfinished(region: str) -> Optional[str]:
+    """
+    run_date du checkpoint le plus récent encore présent pour la région (un run terminé
+    supprime le sien), None sinon.
+    """
+    root = _root()
+    if not root.exists():
+        return None
+    suffix = f"_{region}"
+    dates = sorted(p.name[: -len(suffix)] for p in root.iterdir() if p.is_dir() and p.name.endswith(suffix))
+    return dates[-1] if dates else None
+
+
+class Checkpoints:
+    def __init__(self, run_date: str, region: str, resume: bool = False) -> None:
+        self.run_date = run_date
+        self.region = region
+        self.path = _root() / f"{run_date}_{region}"
+        if not resume:
+            # nouveau run : les checkpoints inachevés de la région (autres semaines comprises) sont périmés
+            for p in _root().glob(f"*_{region}"):
+                shutil.rmtree(p, ignore_errors=True)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._stages: Dict[str, Any] = self._read_stages()
+
+    def _read_stages(self) -> Dict[str, Any]:
+        try:
+            with (self.path / "stages.json").open("r", encoding="utf-8") as f:
+                return json.load(f) or {}
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _write_stages(self) -> None:
+        tmp = self.path / "stages.json.tmp"
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(self._stages, f, ensure_ascii=False)
+        os.replace(tmp, self.path / "stages.json")
+
+    def _file(self, stage: str) -> Path:
+        return self.path / f"{stage}.jsonl.gz"
+
+    def has(self, stage: str) -> bool:
+        return stage in self._stages
+
+    def completed(self) -> List[str]:
+        return list(self._stages)
+
+    def _write(self, stage: str, records: List[Dict[str, Any]]) -> None:
+        tmp = self.path / f"{stage}.jsonl.gz.tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            for r in records:
+                f.write(json.dumps(r, ensure_ascii=False, default=str))
+                f.write("\n")
+        os.replace(tmp, self._file(stage))
+
+    def save(self, stage: str, records: List[Dict[str, Any]], meta: Optional[Dict[str, Any]] = None) -> None:
+        self._write(stage, records)
+        self._stages[stage] = meta or {}
+        self._write_stages()
+
+    def load(self, stage: str) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        return self.read(stage), dict(self._stages.get(stage) or {})
+
+    def read(self, stage: str) -> List[Dict[str, Any]]:
+        out: List[Dict[str, Any]] = []
+        try:
+            with gzip.open(self._file(stage), "rt", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        out.append(json.loads(line))
+                    except ValueError:
+                        break
+        except FileNotFoundError:
+            pass
+        except (EOFError, OSError):
+            # membre gzip tronqué (run tué pendant un append) : on garde ce qui a été lu
+            pass
+        return out
+
+    def reopen(self, stage: str) -> List[Dict[str, Any]]:
+        """
+        Relit une étape en append et la réécrit proprement (sans membre tronqué),
+        pour que les appends suivants restent lisibles.
+        """
+        records = self.read(stage)
+        self._write(stage, records)
+        return records
+
+    def append(self, stage: str, record: Dict[str, Any]) -> None:
+        # un membre gzip par record : chaque ligne est durable dès l'append
+        with gzip.open(self._file(stage), "at", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False, default=str))
+            f.write("\n")
+
+    def finish(self) -> None:
+        if not checkpoints_keep():
+            shutil.rmtree(self.path, ignore_errors=True)
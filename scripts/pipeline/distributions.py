@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Histogramme compact d'une métrique (vues, partages...) : HIST_BINS cases régulières
+# sur log10(1 + x) entre 0 et HIST_MAX_LOG10 (10^10 vues). ~64 entiers par métrique et par run.
+HIST_BINS = 64
+HIST_MAX_LOG10 = 10.0
+# métriques normalisées en percentile (reach = vues, virality = partages)
+RANK_METRICS = ("views", "shares")
+
+
+def _log_pos(values: np.ndarray) -> np.ndarray:
+    """
+    Position continue dans l'histogramme (0..HIST_BINS).
+    """
+    x = np.log10(1.0 + np.maximum(values.astype(np.float64), 0.0))
+    return np.clip(x / HIST_MAX_LOG10 * HIST_BINS, 0.0, float(HIST_BINS))
+
+
+def histogram(values: np.ndarray) -> List[int]:
+    idx = np.minimum(_log_pos(values).astype(np.int64), HIST_BINS - 1)
+    return np.bincount(idx, minlength=HIST_BINS).astype(np.int64).tolist()
+
+
+def merge_histograms(hists: Sequence[Sequence[int]]) -> Optional[np.ndarray]:
+    valid = [np.asarray(h, dtype=np.int64) for h in hists if h is not None and len(h) == HIST_BINS]
+    if not valid:
+        return None
+    total = np.sum(valid, axis=0)
+    return total if total.sum() > 0 else None
+
+
+def empirical_percentile(values: np.ndarray, reference: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Part des valeurs de référence <= x (0..1). `reference` doit être triée ;
+    par défaut le batch lui-même (un seul tri, O(n log n)).
+    """
+    ref = np.sort(values) if reference is None else reference
+    if ref.size == 0:
+        return np.zeros(values.shape, dtype=np.float64)
+    return np.searchsorted(ref, values, side="right") / float(ref.size)
+
+
+def hist_percentile(values: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """
+    Percentile de x dans une distribution histogramme (interpolation linéaire dans la case).
+    """
+    total = float(counts.sum())
+    if total <= 0:
+        return np.zeros(values.shape, dtype=np.float64)
+    cum = np.concatenate([[0.0], np.cumsum(counts, dtype=np.float64)])
+    pos = _log_pos(values)
+    i = np.minimum(pos.astype(np.int64), HIST_BINS - 1)
+    frac = pos - i
+    return (cum[i] + frac * counts[i]) / total
+
+
+def sorted_reference(arrays: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    return {m: np.sort(arrays[m]) for m in RANK_METRICS if m in arrays}
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import heapq
+import os
+from typing import Callable, Dict, List, Tuple
+
+from scripts.pipeline.candidate import Candidate
+
+
+def max_per_category() -> int:
+    # 0 = pas de quota
+    return max(0, int(os.environ.get("MAX_PER_CATEGORY") or "0"))
+
+
+def category_key(c: Candidate) -> str:
+    return (c.category or "autre").lower()
+
+
+def select_top_n(
+    items: List[Candidate],
+    n: int,
+    max_per_cat: int = 0,
+    group: Callable[[Candidate], str] = category_key,
+) -> List[Candidate]:
+    """
+    Top-n par score en un passage, O(len(items) * log k), sans trier toute la liste.
+    Avec un quota par catégorie, seuls les `max_per_cat` meilleurs de chaque catégorie
+    restent candidats : les places laissées par une catégorie pleine vont aux suivants
+    (backfill). Même résultat qu'un tri stable décroissant + apply_category_diversity + [:n].
+    """
+    if n <= 0:
+        return []
+
+    # tas min bornés, clé (score, -index) : à score égal le premier arrivé gagne (tri stable)
+    Entry = Tuple[int, int, Candidate]
+    heaps: Dict[str, List[Entry]] = {}
+    cap = max_per_cat if max_per_cat > 0 else n
+
+    for i, c in enumerate(items):
+        k = group(c) if max_per_cat > 0 else ""
+        h = heaps.setdefault(k, [])
+        entry = (c.score, -i, c)
+        if len(h) < cap:
+            heapq.heappush(h, entry)
+        elif entry[:2] > h[0][:2]:
+            heapq.heapreplace(h, entry)
+
+    pool = [e for h in heaps.values() for e in h]
+    best = heapq.nlargest(n, pool, key=lambda e: e[:2])
+    return [e[2] for e in best]
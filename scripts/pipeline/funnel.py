@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from scripts.pipeline.candidate import Candidate
+
+
+def llm_concurrency() -> int:
+    return max(1, int(os.environ.get("LLM_CONCURRENCY") or "8"))
+
+
+def funnel_wave_size() -> int:
+    return max(1, int(os.environ.get("FUNNEL_WAVE_SIZE") or str(2 * llm_concurrency())))
+
+
+def funnel_margin() -> int:
+    return max(0, int(os.environ.get("FUNNEL_MARGIN") or "5"))
+
+
+def _selectable(
+    confirmed: List[Candidate],
+    threshold: int,
+    group: Optional[Callable[[Candidate], str]],
+    max_per_group: int,
+) -> int:
+    above = [c for c in confirmed if c.score >= threshold]
+    if group is None or max_per_group <= 0:
+        return len(above)
+
+    counts: Dict[str, int] = {}
+    for c in above:
+        k = group(c)
+        counts[k] = counts.get(k, 0) + 1
+    return sum(min(v, max_per_group) for v in counts.values())
+
+
+def confirm_by_score(
+    candidates: List[Candidate],
+    confirmed: List[Candidate],
+    target: int,
+    check: Callable[[Candidate], Optional[str]],
+    wave_size: Optional[int] = None,
+    workers: Optional[int] = None,
+    group: Optional[Callable[[Candidate], str]] = None,
+    max_per_group: int = 0,
+) -> Tuple[List[Candidate], List[Tuple[Candidate, Optional[str]]]]:
+    """
+    Funnel score-first : `candidates` (pré-scorés) sont vérifiés par vagues concurrentes,
+    du meilleur score au moins bon. `check` renvoie le nom produit vendable ou None.
+
+    Arrêt dès que `target` produits confirmés ont un pré-score >= au meilleur candidat
+    restant : plus aucun candidat non vérifié ne peut alors entrer dans le top.
+    `confirmed` contient les produits déjà connus (sans appel LLM), complété en place.
+    Avec un quota (`group` + `max_per_group`), seuls les produits sélectionnables
+    (quota non dépassé dans leur groupe) comptent pour l'arrêt.
+
+    Retourne (confirmed, [(candidat, produit|None)] pour chaque candidat vérifié).
+    """
+    ranked = sorted(candidates, key=lambda c: c.score, reverse=True)
+    wave_size = wave_size or funnel_wave_size()
+    workers = workers or llm_concurrency()
+
+    checked: List[Tuple[Candidate, Optional[str]]] = []
+    pos = 0
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while pos < len(ranked):
+            if len(confirmed) >= target:
+                threshold = ranked[pos].score
+                if _selectable(confirmed, threshold, group, max_per_group) >= target:
+                    break
+
+            wave = ranked[pos:pos + wave_size]
+            pos += len(wave)
+
+            for c, product in zip(wave, pool.map(check, wave)):
+                checked.append((c, product))
+                if product:
+                    c.title = product
+                    confirmed.append(c)
+
+    return confirmed, checked
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import os
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from scripts.pipeline.candidate import Candidate
+
+
+def incremental_enabled() -> bool:
+    return (os.environ.get("TIKTOK_INCREMENTAL") or "1").strip() != "0"
+
+
+def reject_ttl_days() -> int:
+    # un rejet peut venir d'une réponse LLM illisible : re-vérifié passé ce délai
+    return max(0, int(os.environ.get("TIKTOK_REJECT_TTL_DAYS") or "28"))
+
+
+def video_id_of(c: Candidate) -> str:
+    return str(c.tk.video_id or "").strip()
+
+
+def split_known(
+    candidates: List[Candidate],
+    known: Dict[str, Dict[str, Any]],
+    run_date: str,
+) -> Tuple[List[Candidate], List[Candidate], int]:
+    """
+    Sépare les vidéos jamais vues (-> extraction LLM) des vidéos déjà mappées.
+    Les vidéos connues reprennent le produit stocké (simple refresh des métriques),
+    celles rejetées depuis moins de TIKTOK_REJECT_TTL_DAYS sont écartées sans appel LLM.
+    Un rejet plus ancien repart en extraction (last_seen_run d'une vidéo rejetée n'est
+    pas rafraîchi tant qu'elle reste écartée : c'est la date du dernier verdict).
+    Retourne (nouvelles, rafraîchies, rejetées_connues).
+    """
+    new: List[Candidate] = []
+    refreshed: List[Candidate] = []
+    skipped = 0
+    cutoff = (date.fromisoformat(run_date[:10]) - timedelta(days=reject_ttl_days())).isoformat()
+
+    for c in candidates:
+        memo = known.get(video_id_of(c))
+        if memo is None:
+            new.append(c)
+            continue
+
+        product = memo.get("product_title")
+        if not product:
+            if str(memo.get("last_seen_run") or "")[:10] < cutoff:
+                new.append(c)
+            else:
+                skipped += 1
+            continue
+
+        c.title = product
+        refreshed.append(c)
+
+    return new, refreshed, skipped
+
+
+def memo_rows(
+    candidates: List[Candidate],
+    products: Dict[str, Optional[str]],
+    run_date: str,
+    region: str,
+) -> List[Dict[str, Any]]:
+    """
+    Lignes tiktok_videos pour les vidéos de ce run.
+    products : video_id -> titre produit (None = pas de produit vendable).
+    """
+    rows: List[Dict[str, Any]] = []
+    for c in candidates:
+        vid = video_id_of(c)
+        if not vid or vid not in products:
+            continue
+        rows.append(
+            {
+                "video_id": vid,
+                "region": region,
+                "hashtag": c.tk.hashtag,
+                "created_at": c.tk.created_at,
+                "product_title": products[vid],
+                "last_seen_run": run_date,
+            }
+        )
+    return rows
+
+
+def hashtag_watermarks(candidates: List[Candidate], region: str) -> List[Dict[str, Any]]:
+    """
+    High-water mark par hashtag : createTimeISO le plus récent + nb de vidéos vues ce run.
+    """
+    marks: Dict[str, Dict[str, Any]] = {}
+    for c in candidates:
+        tag = (c.tk.hashtag or "").strip().lower()
+        if not tag:
+            continue
+        m = marks.setdefault(tag, {"hashtag": tag, "region": region, "last_created_at": None, "videos_seen": 0})
+        m["videos_seen"] += 1
+        created = c.tk.created_at
+        # createTimeISO : même format partout -> comparaison de chaînes OK
+        if created and (m["last_created_at"] is None or str(created) > m["last_created_at"]):
+            m["last_created_at"] = str(created)
+    return list(marks.values())
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from supabase import Client
+
+from scripts.pipeline.supabase_db import fetch_leaderboard_dates, fetch_run_products, upsert_leaderboard
+
+# Read model "classement courant" : une ligne leaderboards par (région, run_date) avec
+# le top du run en champs liste uniquement, servie au front en une seule lecture indexée
+# (au lieu de products -> dernier run_date -> top trié, à chaque page vue).
+# products n'a pas de colonne région : le classement est "par région" par sa clé et le
+# RUN_REGION du run qui le publie, pas par filtrage (une base = une région aujourd'hui).
+# Snapshot figé à la publication : un produit masqué en est retiré par un trigger SQL
+# (products_hidden_leaderboards, cf. supabase/migrations), un rescore republie le
+# classement courant (republish_latest).
+
+
+def leaderboard_size() -> int:
+    return max(1, int(os.environ.get("LEADERBOARD_SIZE") or "120"))
+
+
+def leaderboard_history() -> int:
+    return max(1, int(os.environ.get("LEADERBOARD_RUN_DATES") or "8"))
+
+
+def leaderboard_entry(p: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Row products (LIST_COLUMNS) -> entrée au format Product du front
+    (analysis réduit à ses 3 premiers risques, seuls affichés en liste).
+    """
+    entry = {k: v for k, v in p.items() if k != "risks"}
+    risks = p.get("risks") if isinstance(p.get("risks"), list) else []
+    entry["analysis"] = {"risks": risks[:3]}
+    return entry
+
+
+def build_leaderboard(
+    run_date: str,
+    region: str,
+    products: List[Dict[str, Any]],
+    run_dates: List[str],
+) -> Dict[str, Any]:
+    dates = sorted({run_date, *run_dates}, reverse=True)[: leaderboard_history()]
+    return {
+        "region": region,
+        "run_date": run_date,
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "payload": {
+            "run_date": run_date,
+            "run_dates": dates,
+            "products": [leaderboard_entry(p) for p in products],
+        },
+    }
+
+
+def publish_leaderboard(sb: Client, run_date: str, region: str) -> int:
+    """
+    Relit le top du run (lignes écrites + inchangées, hors is_hidden) et publie le
+    classement sous `region`. Les produits lus ne sont filtrés que par run_date
+    (cf. en-tête). Retourne le nombre de produits publiés.
+    """
+    products = fetch_run_products(sb, run_date, leaderboard_size())
+    run_dates = fetch_leaderboard_dates(sb, region, leaderboard_history())
+    upsert_leaderboard(sb, build_leaderboard(run_date, region, products, run_dates))
+    return len(products)
+
+
+def republish_latest(sb: Client, region: str, run_dates: Optional[Iterable[str]] = None) -> Optional[str]:
+    """
+    Republie le classement le plus récent de la région (après un rescore, un masquage...).
+    Les classements plus anciens restent figés : products ne garde que le dernier run de
+    chaque slug, les relire perdrait les produits revus depuis.
+    `run_dates` : ne republie que si le dernier classement est l'un d'eux.
+    Retourne le run_date republié, None sinon.
+    """
+    dates = fetch_leaderboard_dates(sb, region, 1)
+    if not dates:
+        return None
+    latest = dates[0]
+    if run_dates is not None and latest not in {str(d)[:10] for d in run_dates}:
+        return None
+    publish_leaderboard(sb, latest, region)
+    return latest
@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+
+def state_dir() -> Path:
+    """
+    Dossier d'état local du pipeline (caches, checkpoints).
+    En CI il est persisté entre runs via actions/cache.
+    """
+    p = Path(os.environ.get("PIPELINE_STATE_DIR") or ".pipeline_state")
+    p.mkdir(parents=True, exist_ok=True)
+    return p
+
+
+def read_json(name: str, default: Any = None) -> Any:
+    path = state_dir() / name
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return default
+
+
+def write_json(name: str, data: Any) -> None:
+    # écriture atomique : un run tué en plein write ne corrompt pas le fichier
+    path = state_dir() / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import mimetypes
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from scripts.pipeline.candidate import Candidate
+from scripts.pipeline.local_state import read_json, state_dir, write_json
+
+# Miroir des médias des gagnants (mp4 Apify, cover TikTok signée qui expire) vers notre
+# stockage : téléchargement en streaming plafonné, dédup par sha256 du contenu (chemin =
+# hash, jamais ré-uploadé), uploads concurrents bornés. Seulement pour le top-N final.
+
+MEDIA_INDEX_FILE = "media_index.json"
+
+
+def media_mirror_enabled() -> bool:
+    return (os.environ.get("MEDIA_MIRROR") or "1").strip() != "0"
+
+
+def media_concurrency() -> int:
+    return max(1, int(os.environ.get("MEDIA_CONCURRENCY") or "6"))
+
+
+def _max_bytes(kind: str) -> int:
+    if kind == "video":
+        return int(os.environ.get("MEDIA_MAX_VIDEO_BYTES") or str(60 * 1024 * 1024))
+    return int(os.environ.get("MEDIA_MAX_IMAGE_BYTES") or str(5 * 1024 * 1024))
+
+
+def media_timeout() -> float:
+    return float(os.environ.get("MEDIA_TIMEOUT_SECONDS") or "60")
+
+
+class MediaTooLarge(Exception):
+    pass
+
+
+class SupabaseStorage:
+    """
+    Bucket public Supabase Storage (API REST, client httpx async partagé).
+    """
+
+    def __init__(self, client: httpx.AsyncClient, bucket: Optional[str] = None) -> None:
+        self.client = client
+        self.bucket = bucket or os.environ.get("SUPABASE_MEDIA_BUCKET", "product-media")
+        self.base = os.environ["SUPABASE_URL"].rstrip("/")
+        key = os.environ["SUPABASE_SERVICE_ROLE_KEY"]
+        self.headers = {"Authorization": f"Bearer {key}", "apikey": key}
+
+    def public_url(self, path: str) -> str:
+        return f"{self.base}/storage/v1/object/public/{self.bucket}/{path}"
+
+    async def exists(self, path: str) -> bool:
+        r = await self.client.head(self.public_url(path))
+        return r.status_code == 200
+
+    async def upload(self, path: str, data: bytes, content_type: str) -> None:
+        r = await self.client.post(
+            f"{self.base}/storage/v1/object/{self.bucket}/{path}",
+            content=data,
+            headers={**self.headers, "content-type": content_type, "x-upsert": "true", "cache-control": "31536000"},
+        )
+        r.raise_for_status()
+
+
+class LocalStorage:
+    """
+    Stand-in local (dev / vérifs) : fichiers sous `root`, URL = base_url + chemin.
+    """
+
+    def __init__(self, root: str, base_url: Optional[str] = None) -> None:
+        self.root = Path(root)
+        self.base_url = (base_url or self.root.resolve().as_uri()).rstrip("/")
+        self.uploads = 0
+
+    def public_url(self, path: str) -> str:
+        return f"{self.base_url}/{path}"
+
+    async def exists(self, path: str) -> bool:
+        return (self.root / path).exists()
+
+    async def upload(self, path: str, data: bytes, content_type: str) -> None:
+        dest = self.root / path
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dest.with_name(dest.name + ".tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, dest)
+        self.uploads += 1
+
+
+def default_storage(client: httpx.AsyncClient) -> Any:
+    # MEDIA_STORAGE=local : pas d'upload Supabase (MEDIA_LOCAL_DIR / MEDIA_PUBLIC_BASE)
+    if (os.environ.get("MEDIA_STORAGE") or "supabase").strip() == "local":
+        root = os.environ.get("MEDIA_LOCAL_DIR") or str(state_dir() / "media")
+        return LocalStorage(root, os.environ.get("MEDIA_PUBLIC_BASE"))
+    return SupabaseStorage(client)
+
+
+def _ext(content_type: str, kind: str) -> str:
+    ext = mimetypes.guess_extension((content_type or "").split(";")[0].strip()) or ""
+    if ext in (".jpe", ".jpeg"):
+        return ".jpg"
+    return ext or (".mp4" if kind == "video" else ".jpg")
+
+
+async def fetch_capped(client: httpx.AsyncClient, url: str, max_bytes: int) -> Tuple[bytes, str]:
+    """
+    GET en streaming, abandon dès que max_bytes est dépassé (Content-Length ou flux).
+    """
+    async with client.stream("GET", url) as r:
+        r.raise_for_status()
+        length = int(r.headers.get("content-length") or 0)
+        if length > max_bytes:
+            raise MediaTooLarge(f"{length} > {max_bytes} bytes")
+        buf = bytearray()
+        async for chunk in r.aiter_bytes():
+            buf.extend(chunk)
+            if len(buf) > max_bytes:
+                raise MediaTooLarge(f"> {max_bytes} bytes")
+        return bytes(buf), r.headers.get("content-type") or ""
+
+
+async def _store(storage: Any, sem: asyncio.Semaphore, path: str, data: bytes, content_type: str, stats: Dict[str, int]) -> None:
+    # contenu déjà dans le bucket (run précédent, autre région...) : pas de ré-upload
+    async with sem:
+        if await storage.exists(path):
+            stats["deduped"] += 1
+            return
+        await storage.upload(path, data, content_type)
+    stats["uploaded"] += 1
+    stats["bytes"] += len(data)
+
+
+async def _mirror_one(
+    client: httpx.AsyncClient,
+    storage: Any,
+    sem: asyncio.Semaphore,
+    index: Dict[str, str],
+    uploads: Dict[str, "asyncio.Task[None]"],
+    source_key: str,
+    url: str,
+    kind: str,
+    stats: Dict[str, int],
+) -> Optional[str]:
+    # même source déjà miroitée lors d'un run précédent : pas de téléchargement
+    if source_key in index:
+        stats["cached"] += 1
+        return index[source_key]
+
+    try:
+        async with sem:
+            data, content_type = await fetch_capped(client, url, _max_bytes(kind))
+        digest = hashlib.sha256(data).hexdigest()
+        path = f"{kind}s/{digest[:2]}/{digest}{_ext(content_type, kind)}"
+
+        # contenu identique dans ce run (repost, autre URL signée) : une seule tâche
+        # d'upload par chemin, les doublons attendent son résultat (échec compris)
+        task = uploads.get(path)
+        if task is None:
+            task = asyncio.ensure_future(_store(
+                storage, sem, path, data, content_type or ("video/mp4" if kind == "video" else "image/jpeg"), stats,
+            ))
+            uploads[path] = task
+        else:
+            stats["deduped"] += 1
+        await task
+    except MediaTooLarge as e:
+        stats["too_large"] += 1
+        print(f"⚠️ media {kind} trop lourd ({source_key}):", e)
+        return None
+    except Exception as e:
+        stats["errors"] += 1
+        print(f"⚠️ media {kind} ({source_key}):", e)
+        return None
+
+    # indexé seulement une fois l'objet stocké
+    public = storage.public_url(path)
+    index[source_key] = public
+    return public
+
+
+async def _mirror(winners: List[Candidate], storage: Any = None) -> Dict[str, int]:
+    stats = {"uploaded": 0, "deduped": 0, "cached": 0, "too_large": 0, "errors": 0, "bytes": 0}
+    index: Dict[str, str] = read_json(MEDIA_INDEX_FILE, {}) or {}
+    sem = asyncio.Semaphore(media_concurrency())
+    uploads: Dict[str, "asyncio.Task[None]"] = {}
+
+    async with httpx.AsyncClient(timeout=media_timeout(), follow_redirects=True) as client:
+        storage = storage or default_storage(client)
+
+        jobs = []
+        targets: List[Tuple[Candidate, str]] = []
+        for w in winners:
+            vid = w.tk.video_id or w.tk.video_url or ""
+            if w.tk.video_storage_url:
+                jobs.append(_mirror_one(client, storage, sem, index, uploads, f"video:{vid or w.tk.video_storage_url}", w.tk.video_storage_url, "video", stats))
+                targets.append((w, "video"))
+            if w.tk.cover_url:
+                jobs.append(_mirror_one(client, storage, sem, index, uploads, f"image:{vid or w.tk.cover_url}", w.tk.cover_url, "image", stats))
+                targets.append((w, "image"))
+
+        results = await asyncio.gather(*jobs)
+
+    for (w, kind), url in zip(targets, results):
+        if not url:
+            continue
+        if kind == "video":
+            w.tk.video_storage_url = url
+        else:
+            w.image_url = url
+            w.image_detail_url = url
+            w.image_source = "tiktok_cover"
+
+    write_json(MEDIA_INDEX_FILE, index)
+    return stats
+
+
+def mirror_winner_media(winners: List[Candidate], storage: Any = None) -> Dict[str, int]:
+    """
+    Miroir vidéo + cover des gagnants ; remplace video_storage_url et pose image_url
+    (URLs stables chez nous). Un média en échec garde l'URL d'origine.
+    Retourne les compteurs (uploaded, deduped, cached, too_large, errors, bytes).
+    """
+    if not winners:
+        return {}
+    return asyncio.run(_mirror(winners, storage))
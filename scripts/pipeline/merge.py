@@ -1,16 +1,167 @@
 from __future__ import annotations
-from typing import Any, Dict, List
+from typing import Callable, Dict, List, Optional, Set
+
+from scripts.pipeline.candidate import Candidate, TikTokSignals
+from scripts.pipeline.text import canonical_caption
+
+# Fusion O(n) par index de clés (dicts) :
+#  - même vidéo (video_id, URL web, mp4) : métriques max (même vidéo vue sous plusieurs hashtags)
+#  - même caption canonique / même produit : vidéos différentes, métriques sommées,
+#    video_count cumulé et toutes les video_url conservées
+# Le candidat gardé conserve sa caption d'origine ; les champs vidéo suivent la vidéo la plus vue.
+
+_METRICS = ("views", "likes", "shares", "comments")
+_LEAD_FIELDS = (
+    "video_id", "hashtag", "video_url", "video_storage_url", "cover_url", "author", "created_at", "duration_seconds",
+)
+
+
+def _video_urls(tk: TikTokSignals) -> List[str]:
+    if tk.video_urls:
+        return tk.video_urls
+    return [tk.video_url] if tk.video_url else []
+
+
+def _add_urls(into: TikTokSignals, other: TikTokSignals, seen: Set[str]) -> None:
+    # `seen` = URLs déjà dans into.video_urls (ajout en place, O(1) par URL)
+    for u in _video_urls(other):
+        if u not in seen:
+            seen.add(u)
+            into.video_urls.append(u)
+
+
+def _start_group(c: Candidate) -> Set[str]:
+    c.tk.video_urls = list(dict.fromkeys(_video_urls(c.tk)))
+    return set(c.tk.video_urls)
+
+
+def _lead_views(tk: TikTokSignals) -> int:
+    return tk.views if tk.lead_views is None else tk.lead_views
+
+
+def _same_lead(into: TikTokSignals, other: TikTokSignals) -> bool:
+    return any(a and a == b for a, b in (
+        (into.video_id, other.video_id),
+        (into.video_url, other.video_url),
+        (into.video_storage_url, other.video_storage_url),
+    ))
+
+
+def _absorb_same_video(into: TikTokSignals, other: TikTokSignals) -> None:
+    # groupe déjà fusionné : ses vues de tête ne bougent que si c'est la vidéo de tête
+    if into.lead_views is not None and _same_lead(into, other):
+        into.lead_views = max(into.lead_views, other.views)
+    for m in _METRICS:
+        setattr(into, m, max(getattr(into, m), getattr(other, m)))
+    if other.views_per_hour is not None and (into.views_per_hour is None or other.views_per_hour > into.views_per_hour):
+        into.views_per_hour = other.views_per_hour
+        into.shares_per_hour = other.shares_per_hour
+    for f in _LEAD_FIELDS:
+        if getattr(into, f) is None:
+            setattr(into, f, getattr(other, f))
+
+
+def _absorb_other_video(into: TikTokSignals, other: TikTokSignals) -> None:
+    # comparaison vidéo de tête contre vidéo de tête : into.views est déjà une somme
+    lead, own = _lead_views(into), _lead_views(other)
+    if own > lead:
+        for f in _LEAD_FIELDS:
+            setattr(into, f, getattr(other, f))
+    into.lead_views = max(lead, own)
+    for m in _METRICS:
+        setattr(into, m, getattr(into, m) + getattr(other, m))
+
+    # vélocité : somme si connue partout, sinon None (pas de points de vélocité)
+    if into.views_per_hour is None or other.views_per_hour is None:
+        into.views_per_hour = None
+        into.shares_per_hour = None
+    else:
+        into.views_per_hour = round(into.views_per_hour + other.views_per_hour, 2)
+        into.shares_per_hour = round((into.shares_per_hour or 0.0) + (other.shares_per_hour or 0.0), 2)
+
+    into.video_count += other.video_count
+
+
+def _absorb(into: Candidate, other: Candidate, same_video: bool, seen: Set[str]) -> None:
+    if same_video:
+        _absorb_same_video(into.tk, other.tk)
+    else:
+        _absorb_other_video(into.tk, other.tk)
+    _add_urls(into.tk, other.tk, seen)
+    for s in other.sources:
+        if s not in into.sources:
+            into.sources.append(s)
+
+
+def _video_keys(c: Candidate) -> List[str]:
+    tk = c.tk
+    return [k for k in (
+        f"id:{tk.video_id}" if tk.video_id else "",
+        f"url:{tk.video_url}" if tk.video_url else "",
+        f"mp4:{tk.video_storage_url}" if tk.video_storage_url else "",
+    ) if k]
+
+
+def merge_candidates(items: List[Candidate], stats: Optional[Dict[str, int]] = None) -> List[Candidate]:
+    """
+    Premier passage (captions brutes) : index par identité vidéo puis caption canonique
+    (cf. text.canonical_caption). La première clé trouvée désigne le groupe.
+    `stats` (optionnel, complété en place) : duplicates (même vidéo) et reposts_collapsed
+    (autres vidéos, même caption canonique = extractions LLM évitées).
+    """
+    out: List[Candidate] = []
+    urls: List[Set[str]] = []
+    index: Dict[str, int] = {}
+    duplicates = 0
+    reposts = 0
 
-def merge_candidates(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    seen=set()
-    out=[]
     for c in items or []:
-        t=(c.get("title") or "").strip()
+        t = (c.title or "").strip()
         if not t:
             continue
-        k=t.lower()
-        if k in seen:
+
+        vkeys = _video_keys(c)
+        # caption réduite à des hashtags / emojis : clé brute
+        ckey = "cap:" + (canonical_caption(t) or t.lower())
+
+        pos = next((index[k] for k in vkeys if k in index), None)
+        if pos is not None:
+            _absorb(out[pos], c, True, urls[pos])
+            duplicates += 1
+        elif ckey in index:
+            pos = index[ckey]
+            _absorb(out[pos], c, False, urls[pos])
+            reposts += 1
+        else:
+            pos = len(out)
+            urls.append(_start_group(c))
+            out.append(c)
+
+        for k in vkeys + [ckey]:
+            index.setdefault(k, pos)
+
+    if stats is not None:
+        stats["duplicates"] = stats.get("duplicates", 0) + duplicates
+        stats["reposts_collapsed"] = stats.get("reposts_collapsed", 0) + reposts
+    return out
+
+
+def merge_by_key(items: List[Candidate], key: Callable[[Candidate], str]) -> List[Candidate]:
+    """
+    Second passage (après extraction) : candidats dont `key` (ex : slug produit) est égal
+    = même produit sur des vidéos différentes -> signaux sommés. Clé vide = pas de fusion.
+    """
+    out: List[Candidate] = []
+    urls: List[Set[str]] = []
+    index: Dict[str, int] = {}
+    for c in items or []:
+        k = key(c)
+        if k and k in index:
+            pos = index[k]
+            _absorb(out[pos], c, False, urls[pos])
             continue
-        seen.add(k)
+        if k:
+            index[k] = len(out)
+        urls.append(_start_group(c))
         out.append(c)
     return out
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+from supabase import Client
+
+from scripts.pipeline.supabase_db import fetch_run_log, upsert_run_log
+
+
+def _max_errors() -> int:
+    return max(1, int(os.environ.get("RUN_LOG_MAX_ERRORS") or "20"))
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class RunLog:
+    """
+    Ligne `runs` du run, réécrite à la fin de chaque étape (un run tué garde ses
+    timings et compteurs jusqu'à la dernière étape terminée).
+    Écriture best-effort : un échec Supabase n'arrête jamais le pipeline.
+    Reprise (--resume) : la ligne de la tentative interrompue est relue, ses timings
+    passent dans stats.previous_attempts et ses erreurs sont conservées ; started_at
+    reste le début du run, attempt_started_at celui de la tentative courante.
+    """
+
+    def __init__(self, sb: Client, run_date: str, region: str, resume: bool = False) -> None:
+        self.sb = sb
+        self.run_date = run_date
+        self.region = region
+        self.started_at = _now_iso()
+        self.attempt_started_at = self.started_at
+        self.finished_at = None
+        self.status = "running"
+        self.stages: Dict[str, float] = {}
+        # temps cumulé d'appels faits en parallèle (somme des workers, pas du mur)
+        self.call_time: Dict[str, float] = {}
+        self.counts: Dict[str, Any] = {}
+        self.extra: Dict[str, Any] = {}
+        self.errors: List[Dict[str, str]] = []
+        self.errors_total = 0
+        self.previous_attempts: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        if resume:
+            self._resume_from(self._load_previous())
+        self.flush()
+
+    def _load_previous(self) -> Optional[Dict[str, Any]]:
+        try:
+            return fetch_run_log(self.sb, self.run_date, self.region)
+        except Exception as e:
+            print("⚠️ fetch_run_log:", e)
+            return None
+
+    def _resume_from(self, prev: Optional[Dict[str, Any]]) -> None:
+        if not prev:
+            return
+        stats = prev.get("stats") or {}
+        self.started_at = prev.get("started_at") or self.started_at
+        self.previous_attempts = list(stats.get("previous_attempts") or []) + [{
+            "attempt": stats.get("attempt") or 1,
+            "started_at": stats.get("attempt_started_at") or prev.get("started_at"),
+            "finished_at": prev.get("finished_at"),
+            "status": prev.get("status"),
+            "stages_s": stats.get("stages_s") or {},
+            "calls_s": stats.get("calls_s") or {},
+        }]
+        errors = prev.get("errors") or {}
+        self.errors = list(errors.get("samples") or [])[: _max_errors()]
+        self.errors_total = int(errors.get("total") or 0)
+
+    @property
+    def attempt(self) -> int:
+        return len(self.previous_attempts) + 1
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            self.status = "failed"
+            self.error(name, e)
+            raise
+        finally:
+            self.stages[name] = round(self.stages.get(name, 0.0) + time.perf_counter() - t0, 2)
+            self.flush()
+
+    def add_time(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.call_time[name] = self.call_time.get(name, 0.0) + seconds
+
+    def count(self, **counts: Any) -> None:
+        self.counts.update(counts)
+
+    def error(self, where: str, e: BaseException) -> None:
+        with self._lock:
+            self.errors_total += 1
+            if len(self.errors) < _max_errors():
+                self.errors.append({"stage": where, "type": type(e).__name__, "error": str(e)[:300]})
+
+    def warn(self, where: str, e: BaseException) -> None:
+        # erreur non bloquante : log console + échantillon dans runs.errors
+        print(f"⚠️ {where}:", e)
+        self.error(where, e)
+
+    def row(self) -> Dict[str, Any]:
+        return {
+            "run_date": self.run_date,
+            "region": self.region,
+            "status": self.status,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "stats": {
+                "attempt": self.attempt,
+                "attempt_started_at": self.attempt_started_at,
+                "previous_attempts": self.previous_attempts,
+                "stages_s": self.stages,
+                "calls_s": {k: round(v, 2) for k, v in self.call_time.items()},
+                **self.counts,
+                **self.extra,
+            },
+            "errors": {"total": self.errors_total, "samples": self.errors},
+        }
+
+    def flush(self) -> None:
+        try:
+            upsert_run_log(self.sb, self.row())
+        except Exception as e:
+            print("⚠️ upsert_run_log:", e)
+
+    def finish(self, status: str, **extra: Any) -> None:
+        self.status = status
+        self.finished_at = _now_iso()
+        self.extra.update(extra)
+        self.flush()
@@ -1,8 +1,13 @@
 from __future__ import annotations
 
+import json
 import math
-from datetime import datetime, timezone
-from typing import Any, Dict, Optional
+import os
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple, Union
+
+from scripts.pipeline.candidate import Candidate, TikTokSignals
 
 
 def _safe_int(x: Any) -> int:
@@ -42,55 +47,161 @@ def _log_norm(x: float, maxv: float) -> float:
     return _clamp(math.log1p(x) / math.log1p(maxv), 0.0, 1.0)
 
 
-def _recency_score(created_at_iso: Any) -> int:
+# recency : seuils en jours (bornes incluses) -> points 0..20 (plus généreux)
+RECENCY_DAYS = [2, 5, 10, 20, 45, 120]
+RECENCY_POINTS = [20, 17, 14, 10, 7, 4, 2]
+RECENCY_UNKNOWN = 6  # si inconnu, on donne un petit score au lieu de 0 (sinon ça plombe)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_US = timedelta(microseconds=1)
+
+
+def epoch_us(d: datetime) -> int:
+    return (d - _EPOCH) // _US
+
+
+# vélocité : vues/h et partages/h donnant le max (échelle fixe -> comparable d'un run à l'autre)
+VELOCITY_REF_VIEWS_PER_HOUR = 50_000
+VELOCITY_REF_SHARES_PER_HOUR = 500
+
+# points max par composante (total 100). Vélocité à 0 par défaut : scores inchangés
+# tant que SCORING_VELOCITY n'est pas activé.
+DEFAULT_WEIGHTS: Dict[str, float] = {
+    "reach": 35,
+    "velocity": 0,
+    "engagement": 25,
+    "virality": 20,
+    "recency": 15,
+    "quality": 5,
+}
+
+# SCORING_VELOCITY=1 : 10 points de reach passent à la vélocité snapshot
+VELOCITY_WEIGHTS: Dict[str, float] = {**DEFAULT_WEIGHTS, "reach": 25, "velocity": 10}
+
+
+def velocity_enabled() -> bool:
+    return (os.environ.get("SCORING_VELOCITY") or "0").strip() == "1"
+
+
+def base_weights(velocity: Optional[bool] = None) -> Dict[str, float]:
+    on = velocity_enabled() if velocity is None else velocity
+    return dict(VELOCITY_WEIGHTS if on else DEFAULT_WEIGHTS)
+
+
+def load_weights(path: Optional[str]) -> Dict[str, float]:
+    """
+    Fichier JSON {"reach": 30, ...} -> poids surchargés seulement ; les clés absentes
+    gardent les poids de base du contexte (cf. base_weights).
+    """
+    if not path:
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f) or {}
+    unknown = set(data) - set(DEFAULT_WEIGHTS)
+    if unknown:
+        raise RuntimeError(f"Poids inconnus: {sorted(unknown)}")
+    return {k: float(v) for k, v in data.items()}
+
+
+class ScoringContext:
+    """
+    Contexte d'un run de scoring : une seule heure de référence pour tous les candidats
+    (scores reproductibles au re-scoring), parsing ISO mémoïsé (epoch en µs) et poids.
+    """
+
+    def __init__(
+        self,
+        now: Optional[datetime] = None,
+        weights: Optional[Dict[str, float]] = None,
+        norm: Optional[str] = None,
+        velocity: Optional[bool] = None,
+    ) -> None:
+        self.now = (now or datetime.now(timezone.utc)).astimezone(timezone.utc)
+        self.weights = {**base_weights(velocity), **(weights or {})}
+        self.now_us = epoch_us(self.now)
+        self._parsed: Dict[Any, Optional[int]] = {}
+
+        # normalisation reach / virality : "log" (max du run, référence scalaire) ou "rank"
+        # (percentiles, batch NumPy uniquement ; cf. scoring_np / distributions)
+        self.norm = (norm or os.environ.get("SCORING_NORM") or "log").strip().lower()
+        # rank : population de référence triée par métrique (défaut = le batch scoré)
+        self.reference: Dict[str, Any] = {}
+        # rank : histogrammes cumulés des runs précédents + poids du mélange
+        self.history: Dict[str, Any] = {}
+        self.history_weight = float(os.environ.get("SCORING_RANK_HISTORY_WEIGHT") or "0.5")
+
+    def parse_us(self, raw: Any) -> Optional[int]:
+        try:
+            return self._parsed[raw]
+        except KeyError:
+            d = _parse_iso(raw)
+            us = epoch_us(d) if d else None
+            self._parsed[raw] = us
+            return us
+        except TypeError:  # clé non hashable
+            d = _parse_iso(raw)
+            return epoch_us(d) if d else None
+
+    def recency_points(self, created_at_iso: Any) -> int:
+        us = self.parse_us(created_at_iso)
+        if us is None:
+            return RECENCY_UNKNOWN
+        days = (self.now_us - us) / 1_000_000 / 86400.0
+        return RECENCY_POINTS[bisect_left(RECENCY_DAYS, days)]
+
+
+def _recency_score(created_at_iso: Any, ctx: Optional[ScoringContext] = None) -> int:
     """
     0..20 (plus généreux)
     """
-    d = _parse_iso(created_at_iso)
-    if not d:
-        return 6  # si inconnu, on donne un petit score au lieu de 0 (sinon ça plombe)
-    now = datetime.now(timezone.utc)
-    days = (now - d).total_seconds() / 86400.0
-
-    if days <= 2:
-        return 20
-    if days <= 5:
-        return 17
-    if days <= 10:
-        return 14
-    if days <= 20:
-        return 10
-    if days <= 45:
-        return 7
-    if days <= 120:
-        return 4
-    return 2
+    return (ctx or ScoringContext()).recency_points(created_at_iso)
+
+
+def velocity_rates(tk: TikTokSignals, ctx: ScoringContext) -> Tuple[float, float]:
+    """
+    (vues/h, partages/h) : delta depuis le snapshot précédent, (0, 0) sans snapshot.
+    Pas de repli sur cumul / âge : une moyenne sur la vie de la vidéo n'est pas
+    comparable à un delta hebdo sur la même échelle.
+    """
+    if tk.views_per_hour is None:
+        return 0.0, 0.0
+    return tk.views_per_hour, tk.shares_per_hour or 0.0
+
+
+def tiktok_signals(c: Union[Candidate, Dict[str, Any]]) -> TikTokSignals:
+    """
+    Signaux TikTok d'un Candidate, ou d'un dict historique (ex : products.signals relus).
+    """
+    if isinstance(c, Candidate):
+        return c.tk
+    return TikTokSignals.from_dict((c.get("signals") or {}).get("tiktok_hashtag"))
 
 
 def score_candidate(
-    c: Dict[str, Any],
+    c: Union[Candidate, Dict[str, Any]],
     max_views: int,
     max_likes: int,
     max_shares: int,
+    ctx: Optional[ScoringContext] = None,
 ) -> Dict[str, Any]:
     """
     TikTok-only score 0..100 (plus "spread")
-    Breakdown:
-      - reach/views (0..35)      [log-norm]
+    Breakdown (poids par défaut, cf. ctx.weights / DEFAULT_WEIGHTS):
+      - reach/views (0..35)      [log-norm ; 0..25 avec SCORING_VELOCITY=1]
+      - velocity (0 ; 0..10)     [vues/h + partages/h snapshot, cf. velocity_rates]
       - engagement (0..25)       [like+comment+share rate]
       - virality (0..20)         [shares + share_rate]
       - recency (0..15)
       - quality (0..5)           [duration + like_rate]
     """
-    signals = c.get("signals") or {}
-    tk = (signals.get("tiktok_hashtag") or {})
+    tk = tiktok_signals(c)
 
-    views = _safe_int(tk.get("views"))
-    likes = _safe_int(tk.get("likes"))
-    shares = _safe_int(tk.get("shares"))
-    comments = _safe_int(tk.get("comments"))
-    duration = _safe_int(tk.get("duration_seconds"))
-    created_at = tk.get("created_at")
+    views = tk.views
+    likes = tk.likes
+    shares = tk.shares
+    comments = tk.comments
+    duration = _safe_int(tk.duration_seconds)
+    created_at = tk.created_at
 
     # ratios
     if views > 0:
@@ -103,30 +214,41 @@ def score_candidate(
         like_rate = 0.0
 
     # 1) Reach/views: 0..35 (log)
-    reach = int(round(_log_norm(views, float(max_views)) * 35))
+    ctx = ctx or ScoringContext()
+    w = ctx.weights
+
+    reach = int(round(_log_norm(views, float(max_views)) * w["reach"]))
+
+    # 1b) Velocity: 0..10 si activée (croissance depuis le snapshot, pas le cumul)
+    views_ph, shares_ph = velocity_rates(tk, ctx)
+    velocity = int(round(_clamp(
+        0.7 * _log_norm(views_ph, VELOCITY_REF_VIEWS_PER_HOUR) + 0.3 * _log_norm(shares_ph, VELOCITY_REF_SHARES_PER_HOUR),
+        0.0, 1.0,
+    ) * w["velocity"]))
 
     # 2) Engagement: 0..25
     # 6% engagement => max (un peu plus facile à atteindre)
-    eng = int(round(_clamp(engagement_rate / 0.06, 0.0, 1.0) * 25))
+    eng = int(round(_clamp(engagement_rate / 0.06, 0.0, 1.0) * w["engagement"]))
 
     # 3) Virality: 0..20 (mix shares log + share_rate)
     shares_part = _log_norm(shares, float(max_shares))  # 0..1
     # 0.8% share rate => max (viral)
     share_rate_part = _clamp(share_rate / 0.008, 0.0, 1.0)
-    virality = int(round((0.65 * shares_part + 0.35 * share_rate_part) * 20))
+    virality = int(round((0.65 * shares_part + 0.35 * share_rate_part) * w["virality"]))
 
     # 4) Recency: 0..15 (plus léger que V1)
-    rec = int(round(_clamp(_recency_score(created_at) / 20.0, 0.0, 1.0) * 15))
+    rec = int(round(_clamp(_recency_score(created_at, ctx) / 20.0, 0.0, 1.0) * w["recency"]))
 
     # 5) Quality: 0..5
     # duration bonus si 6..35s
     dur_ok = 1.0 if (6 <= duration <= 35) else 0.6 if duration else 0.7
     # like_rate 3% => max
     like_ok = _clamp(like_rate / 0.03, 0.0, 1.0)
-    quality = int(round(_clamp(0.6 * dur_ok + 0.4 * like_ok, 0.0, 1.0) * 5))
+    quality = int(round(_clamp(0.6 * dur_ok + 0.4 * like_ok, 0.0, 1.0) * w["quality"]))
 
     breakdown = {
         "reach": reach,
+        "velocity": velocity,
         "engagement": eng,
         "virality": virality,
         "recency": rec,
@@ -136,7 +258,7 @@ def score_candidate(
         "like_rate": round(like_rate, 4),
     }
 
-    score = reach + eng + virality + rec + quality
+    score = reach + velocity + eng + virality + rec + quality
     score = max(0, min(100, int(score)))
 
     return {"score": score, "score_breakdown": breakdown}
\ No newline at end of file
@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from scripts.pipeline.candidate import Candidate
+from scripts.pipeline.distributions import (
+    RANK_METRICS,
+    empirical_percentile,
+    hist_percentile,
+    histogram,
+    merge_histograms,
+    sorted_reference,
+)
+from scripts.pipeline.scoring import (
+    RECENCY_DAYS,
+    RECENCY_POINTS,
+    RECENCY_UNKNOWN,
+    VELOCITY_REF_SHARES_PER_HOUR,
+    VELOCITY_REF_VIEWS_PER_HOUR,
+    ScoringContext,
+    _safe_int,
+    tiktok_signals,
+)
+
+# Version vectorisée de score_candidate : mêmes formules, mêmes arrondis (np.rint = round()
+# Python, arrondi bancaire), un seul passage sur des tableaux colonne.
+# score_candidate reste la référence (cf. scripts/bench/check_scoring.py).
+
+# jours -> score recency brut (0..20), même table que ScoringContext.recency_points
+_RECENCY_DAYS = np.array(RECENCY_DAYS, dtype=np.float64)
+_RECENCY_POINTS = np.array(RECENCY_POINTS, dtype=np.float64)
+
+# int64 "pas de date" (les epochs en µs sont toujours bien au-dessus)
+_NO_DATE = np.iinfo(np.int64).min
+
+
+def signal_arrays(
+    candidates: List[Union[Candidate, Dict[str, Any]]],
+    ctx: Optional[ScoringContext] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Struct-of-arrays des signaux TikTok : views, likes, shares, comments, duration (int64),
+    created_at en µs epoch (_NO_DATE si absente / illisible) et vélocité snapshot (NaN si absente).
+    """
+    views: List[int] = []
+    likes: List[int] = []
+    shares: List[int] = []
+    comments: List[int] = []
+    duration: List[int] = []
+    created: List[int] = []
+    views_ph: List[float] = []
+    shares_ph: List[float] = []
+
+    ctx = ctx or ScoringContext()
+    for c in candidates:
+        tk = tiktok_signals(c)
+        views.append(tk.views)
+        likes.append(tk.likes)
+        shares.append(tk.shares)
+        comments.append(tk.comments)
+        duration.append(_safe_int(tk.duration_seconds))
+
+        us = ctx.parse_us(tk.created_at)
+        created.append(_NO_DATE if us is None else us)
+
+        if tk.views_per_hour is None:
+            views_ph.append(np.nan)
+            shares_ph.append(np.nan)
+        else:
+            views_ph.append(tk.views_per_hour)
+            shares_ph.append(tk.shares_per_hour or 0.0)
+
+    return {
+        "views": np.array(views, dtype=np.int64),
+        "likes": np.array(likes, dtype=np.int64),
+        "shares": np.array(shares, dtype=np.int64),
+        "comments": np.array(comments, dtype=np.int64),
+        "duration": np.array(duration, dtype=np.int64),
+        "created_at_us": np.array(created, dtype=np.int64),
+        "views_per_hour": np.array(views_ph, dtype=np.float64),
+        "shares_per_hour": np.array(shares_ph, dtype=np.float64),
+    }
+
+
+def batch_maxima(arrays: Dict[str, np.ndarray]) -> Tuple[int, int, int]:
+    """
+    max_views / max_likes / max_shares (plancher à 1, comme main()).
+    """
+    def _m(a: np.ndarray) -> int:
+        return max(int(a.max()) if a.size else 0, 1)
+
+    return _m(arrays["views"]), _m(arrays["likes"]), _m(arrays["shares"])
+
+
+def _log_norm(x: np.ndarray, maxv: float) -> np.ndarray:
+    if maxv <= 0:
+        return np.zeros(x.shape, dtype=np.float64)
+    xf = x.astype(np.float64)
+    out = np.clip(np.log1p(np.maximum(xf, 0.0)) / np.log1p(maxv), 0.0, 1.0)
+    return np.where(xf > 0, out, 0.0)
+
+
+def _rank_norm(x: np.ndarray, metric: str, ctx: ScoringContext) -> np.ndarray:
+    """
+    Percentile empirique (0..1) dans la population de référence du run, mélangé
+    avec la distribution des runs précédents si un historique est chargé.
+    """
+    pct = empirical_percentile(x, ctx.reference.get(metric))
+    hist = ctx.history.get(metric)
+    if hist is not None and ctx.history_weight > 0:
+        a = min(ctx.history_weight, 1.0)
+        pct = (1.0 - a) * pct + a * hist_percentile(x, hist)
+    return np.where(x > 0, pct, 0.0)
+
+
+def _velocity_rates(arrays: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Même règle que scoring.velocity_rates : snapshot si connu, sinon 0.
+    """
+    known = ~np.isnan(arrays["views_per_hour"])
+    return (
+        np.where(known, arrays["views_per_hour"], 0.0),
+        np.where(known, arrays["shares_per_hour"], 0.0),
+    )
+
+
+def _safe_div(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+    out = np.zeros(num.shape, dtype=np.float64)
+    np.divide(num.astype(np.float64), den.astype(np.float64), out=out, where=den > 0)
+    return out
+
+
+def _round_int(x: np.ndarray) -> np.ndarray:
+    return np.rint(x).astype(np.int64)
+
+
+def score_arrays(
+    arrays: Dict[str, np.ndarray],
+    max_views: Optional[int] = None,
+    max_likes: Optional[int] = None,
+    max_shares: Optional[int] = None,
+    ctx: Optional[ScoringContext] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Composantes + score pour tout le batch. Maxima calculés sur le batch si non fournis.
+    """
+    if max_views is None or max_likes is None or max_shares is None:
+        mv, ml, ms = batch_maxima(arrays)
+        max_views = mv if max_views is None else max_views
+        max_likes = ml if max_likes is None else max_likes
+        max_shares = ms if max_shares is None else max_shares
+
+    ctx = ctx or ScoringContext()
+    w = ctx.weights
+
+    views = arrays["views"]
+    likes = arrays["likes"]
+    shares = arrays["shares"]
+    comments = arrays["comments"]
+    duration = arrays["duration"]
+    created = arrays["created_at_us"]
+
+    engagement_rate = _safe_div(likes + comments + shares, views)
+    share_rate = _safe_div(shares, views)
+    like_rate = _safe_div(likes, views)
+
+    if ctx.norm == "rank":
+        views_part = _rank_norm(views, "views", ctx)
+        shares_part = _rank_norm(shares, "shares", ctx)
+    else:
+        views_part = _log_norm(views, float(max_views))
+        shares_part = _log_norm(shares, float(max_shares))
+
+    reach = _round_int(views_part * w["reach"])
+
+    views_ph, shares_ph = _velocity_rates(arrays)
+    velocity = _round_int(np.clip(
+        0.7 * _log_norm(views_ph, float(VELOCITY_REF_VIEWS_PER_HOUR))
+        + 0.3 * _log_norm(shares_ph, float(VELOCITY_REF_SHARES_PER_HOUR)),
+        0.0, 1.0,
+    ) * w["velocity"])
+
+    eng = _round_int(np.clip(engagement_rate / 0.06, 0.0, 1.0) * w["engagement"])
+
+    share_rate_part = np.clip(share_rate / 0.008, 0.0, 1.0)
+    virality = _round_int((0.65 * shares_part + 0.35 * share_rate_part) * w["virality"])
+
+    now_us = ctx.now_us
+    has_date = created != _NO_DATE
+    days = np.where(has_date, (now_us - np.where(has_date, created, 0)).astype(np.float64) / 1_000_000 / 86400.0, 0.0)
+    rec_raw = np.where(has_date, _RECENCY_POINTS[np.searchsorted(_RECENCY_DAYS, days, side="left")], float(RECENCY_UNKNOWN))
+    rec = _round_int(np.clip(rec_raw / 20.0, 0.0, 1.0) * w["recency"])
+
+    dur_ok = np.where((duration >= 6) & (duration <= 35), 1.0, np.where(duration != 0, 0.6, 0.7))
+    like_ok = np.clip(like_rate / 0.03, 0.0, 1.0)
+    quality = _round_int(np.clip(0.6 * dur_ok + 0.4 * like_ok, 0.0, 1.0) * w["quality"])
+
+    score = np.clip(reach + velocity + eng + virality + rec + quality, 0, 100)
+
+    return {
+        "score": score,
+        "reach": reach,
+        "velocity": velocity,
+        "engagement": eng,
+        "virality": virality,
+        "recency": rec,
+        "quality": quality,
+        "engagement_rate": engagement_rate,
+        "share_rate": share_rate,
+        "like_rate": like_rate,
+    }
+
+
+def breakdowns(result: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+    """
+    Dicts score_breakdown identiques à score_candidate.
+    Les ratios passent par round() Python (np.round ne donne pas toujours le même 4e décimal).
+    """
+    cols = [
+        result["reach"].tolist(),
+        result["velocity"].tolist(),
+        result["engagement"].tolist(),
+        result["virality"].tolist(),
+        result["recency"].tolist(),
+        result["quality"].tolist(),
+        result["engagement_rate"].tolist(),
+        result["share_rate"].tolist(),
+        result["like_rate"].tolist(),
+    ]
+    return [
+        {
+            "reach": r,
+            "velocity": vel,
+            "engagement": e,
+            "virality": v,
+            "recency": rc,
+            "quality": q,
+            "engagement_rate": round(er, 4),
+            "share_rate": round(sr, 4),
+            "like_rate": round(lr, 4),
+        }
+        for r, vel, e, v, rc, q, er, sr, lr in zip(*cols)
+    ]
+
+
+def score_candidates_batch(
+    candidates: List[Union[Candidate, Dict[str, Any]]],
+    ctx: Optional[ScoringContext] = None,
+) -> Tuple[int, int, int]:
+    """
+    Équivalent de la boucle score_candidate de main() : pose score / score_breakdown
+    sur chaque candidat, maxima calculés sur la liste. Retourne les maxima utilisés.
+    """
+    if not candidates:
+        return 1, 1, 1
+
+    ctx = ctx or ScoringContext()
+    arrays = signal_arrays(candidates, ctx)
+    maxima = batch_maxima(arrays)
+    result = score_arrays(arrays, *maxima, ctx=ctx)
+
+    for c, s, b in zip(candidates, result["score"].tolist(), breakdowns(result)):
+        if isinstance(c, Candidate):
+            c.score = s
+            c.score_breakdown = b
+        else:
+            c["score"] = s
+            c["score_breakdown"] = b
+
+    return maxima
+
+
+def attach_distribution(
+    ctx: ScoringContext,
+    candidates: List[Union[Candidate, Dict[str, Any]]],
+    history: Optional[Dict[str, List[List[int]]]] = None,
+) -> Dict[str, List[int]]:
+    """
+    Mode rank : fixe la population de référence du run (tous les candidats, pas seulement
+    ceux scorés ensuite) et l'historique des runs précédents.
+    Retourne les histogrammes compacts du run, à stocker pour les runs suivants.
+    """
+    arrays = signal_arrays(candidates, ctx)
+    ctx.reference = sorted_reference(arrays)
+    for metric, hists in (history or {}).items():
+        merged = merge_histograms(hists)
+        if merged is not None:
+            ctx.history[metric] = merged
+    return {m: histogram(arrays[m]) for m in RANK_METRICS}
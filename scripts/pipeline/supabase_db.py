@@ -1,12 +1,547 @@
 from __future__ import annotations
+import hashlib
+import json
 import os
-from typing import Any, Dict, List
+import random
+import time
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 from supabase import create_client, Client
 
 def get_supabase() -> Client:
     return create_client(os.environ["SUPABASE_URL"], os.environ["SUPABASE_SERVICE_ROLE_KEY"])
 
-def upsert_products(sb: Client, rows: List[Dict[str, Any]]) -> None:
+def unique_by_slug(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Un seul row par slug dans un batch (sinon Postgres : "cannot affect row a second
+    time") : on garde le meilleur score. Slug vide = row ignoré.
+    """
+    best: Dict[str, Dict[str, Any]] = {}
+    for r in rows:
+        slug = r.get("slug")
+        if not slug:
+            print("⚠️ upsert_products: row sans slug ignoré:", r.get("title"))
+            continue
+        prev = best.get(slug)
+        if prev is None or int(r.get("score") or 0) > int(prev.get("score") or 0):
+            best[slug] = r
+    if len(best) < len(rows):
+        print(f"⚠️ upsert_products: {len(rows) - len(best)} row(s) en double par slug écarté(s)")
+    return list(best.values())
+
+
+def _upsert_chunk_bytes() -> int:
+    return max(10_000, int(os.environ.get("UPSERT_CHUNK_BYTES") or "1000000"))
+
+
+def _upsert_concurrency() -> int:
+    return max(1, int(os.environ.get("UPSERT_CONCURRENCY") or "4"))
+
+
+def _upsert_retries() -> int:
+    return max(0, int(os.environ.get("UPSERT_RETRIES") or "4"))
+
+
+def _upsert_backoff() -> float:
+    return float(os.environ.get("UPSERT_BACKOFF_SECONDS") or "1.0")
+
+
+def _byte_chunks(rows: List[Dict[str, Any]], max_bytes: int) -> List[List[Dict[str, Any]]]:
+    """
+    Découpe par taille de payload JSON (les rows complets portent un gros `analysis`).
+    Un row plus gros que max_bytes part seul.
+    """
+    chunks: List[List[Dict[str, Any]]] = []
+    cur: List[Dict[str, Any]] = []
+    size = 0
+    for r in rows:
+        n = len(json.dumps(r, ensure_ascii=False, default=str).encode("utf-8"))
+        if cur and size + n > max_bytes:
+            chunks.append(cur)
+            cur, size = [], 0
+        cur.append(r)
+        size += n
+    if cur:
+        chunks.append(cur)
+    return chunks
+
+
+def _with_retry(call: Callable[[], Any]) -> Tuple[int, Optional[str]]:
+    retries = _upsert_retries()
+    error = None
+    attempt = 0
+    for attempt in range(1, retries + 2):
+        try:
+            call()
+            return attempt, None
+        except Exception as e:
+            error = str(e)[:300]
+            if attempt <= retries:
+                delay = _upsert_backoff() * (2 ** (attempt - 1))
+                time.sleep(delay + random.uniform(0, delay / 2))
+    return attempt, error
+
+
+def _upsert_with_retry(
+    sb: Client,
+    table: str,
+    rows: List[Dict[str, Any]],
+    on_conflict: str,
+    ignore_duplicates: bool = False,
+) -> Tuple[int, Optional[str]]:
+    return _with_retry(
+        lambda: sb.table(table).upsert(rows, on_conflict=on_conflict, ignore_duplicates=ignore_duplicates).execute()
+    )
+
+
+def _rpc_with_retry(sb: Client, fn: str, params: Dict[str, Any]) -> Tuple[int, Optional[str]]:
+    return _with_retry(lambda: sb.rpc(fn, params).execute())
+
+
+def _upsert_chunk(sb: Client, chunk: List[Dict[str, Any]], nbytes: int, stored: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Un chunk de produits = product_analyses puis products (upserts idempotents) :
+    products n'est écrit qu'une fois l'analyse stockée, un chunk en échec se rejoue tel quel.
+    Produits dont le content_hash est déjà stocké : products n'est pas réécrit, seuls
+    run_date et score avancent (fonction SQL touch_products, un appel par chunk).
+    """
+    t0 = time.perf_counter()
+    heavy = [analysis_row(r) for r in chunk]
+    light = [list_row(r) for r in chunk if stored.get(r["slug"]) != r["content_hash"]]
+    touch = [
+        {"slug": r["slug"], "run_date": str(r["run_date"]), "score": r.get("score")}
+        for r in chunk
+        if stored.get(r["slug"]) == r["content_hash"]
+    ]
+
+    attempts, error = _upsert_with_retry(sb, "product_analyses", heavy, "slug,run_date")
+    if error is None and light:
+        more, error = _upsert_with_retry(sb, "products", light, "slug")
+        attempts += more
+    if error is None and touch:
+        more, error = _rpc_with_retry(sb, "touch_products", {"rows": touch})
+        attempts += more
+    return {
+        "rows": len(chunk),
+        "skipped": len(touch),
+        "bytes": nbytes,
+        "attempts": attempts,
+        "ms": round((time.perf_counter() - t0) * 1000, 1),
+        "ok": error is None,
+        "error": error,
+    }
+
+
+# colonnes lourdes : stockées dans product_analyses, plus dans products
+HEAVY_COLUMNS = ("analysis", "signals", "score_breakdown")
+
+
+def analysis_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    product_analyses : (slug, run_date) unique, title, score, analysis, signals,
+    score_breakdown. Historique par run (products ne garde que le dernier run du slug).
+    """
+    out = {k: row.get(k) for k in ("slug", "run_date", "title", "score")}
+    out.update({k: row.get(k) for k in HEAVY_COLUMNS})
+    return out
+
+
+def list_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Row products allégé : colonnes liste + `risks` (3 premiers, seuls affichés en liste).
+    Les blobs sont remis à null (anciens rows) : le détail lit product_analyses.
+    """
+    out = {k: v for k, v in row.items() if k not in HEAVY_COLUMNS}
+    risks = (row.get("analysis") or {}).get("risks")
+    out["risks"] = risks[:3] if isinstance(risks, list) else []
+    out.update({k: None for k in HEAVY_COLUMNS})
+    return out
+
+
+# version du hash / du découpage products / product_analyses : la changer force la réécriture
+ROW_FORMAT = 4
+
+# entrées déterministes du row products : produit extrait (titre, slug, catégorie, tags),
+# sources et médias. Hors texte LLM (summary, analysis : régénérés à chaque run) et
+# métriques du run (score, signals, score_breakdown, run_date : avancés sans réécriture).
+HASH_COLUMNS = (
+    "title", "slug", "category", "tags", "sources",
+    "image_url", "image_detail_url", "image_source", "source_url", "video_storage_url",
+)
+
+
+def content_hash(row: Dict[str, Any]) -> str:
+    """
+    sha256 du JSON canonique des HASH_COLUMNS du row (clés triées).
+    """
+    data = {k: row.get(k) for k in HASH_COLUMNS}
+    data["_format"] = ROW_FORMAT
+    raw = json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def fetch_content_hashes(sb: Client, slugs: List[str]) -> Dict[str, str]:
+    """
+    products.content_hash des slugs du batch (une requête par 200 slugs).
+    """
+    out: Dict[str, str] = {}
+    for chunk in _chunks(sorted({s for s in slugs if s}), 200):
+        res = sb.table("products").select("slug,content_hash").in_("slug", chunk).execute()
+        for r in res.data or []:
+            if r.get("content_hash"):
+                out[r["slug"]] = r["content_hash"]
+    return out
+
+
+def upsert_products(sb: Client, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Upsert par chunks (UPSERT_CHUNK_BYTES de JSON), UPSERT_CONCURRENCY chunks en
+    parallèle, retry exponentiel par chunk : un 5xx transitoire ne perd qu'un chunk
+    au pire, jamais tout le run. Chaque row complet est réparti entre product_analyses
+    (blobs, un row par run) et products (colonnes liste), cf. _upsert_chunk.
+    Les produits dont le content_hash est déjà stocké gardent leur row products
+    (titre, résumé, médias) : seuls run_date et score y sont avancés.
+    Retourne les stats : rows_ok / rows_failed / rows_skipped + détail par chunk
+    (rows, skipped, bytes, ms, attempts, ok, error).
+    """
+    # copies : les dicts de l'appelant (checkpoint analyses) ne sont pas modifiés
+    rows = [dict(r, content_hash=content_hash(r)) for r in unique_by_slug(rows)]
     if not rows:
+        return {"rows_ok": 0, "rows_failed": 0, "rows_skipped": 0, "chunks": []}
+
+    # produits identiques au stocké : pas de réécriture products (ni invalidation côté front)
+    try:
+        stored = fetch_content_hashes(sb, [r["slug"] for r in rows])
+    except Exception as e:
+        print("⚠️ fetch_content_hashes:", e)
+        stored = {}
+
+    max_bytes = _upsert_chunk_bytes()
+    chunks = _byte_chunks(rows, max_bytes)
+    sizes = [len(json.dumps(c, ensure_ascii=False, default=str).encode("utf-8")) for c in chunks]
+
+    with ThreadPoolExecutor(max_workers=min(_upsert_concurrency(), len(chunks))) as pool:
+        results = list(pool.map(lambda a: _upsert_chunk(sb, a[0], a[1], stored), zip(chunks, sizes)))
+
+    for i, r in enumerate(results):
+        if not r["ok"]:
+            print(f"⚠️ upsert_products chunk {i} ({r['rows']} rows) en échec après {r['attempts']} essai(s):", r["error"])
+
+    return {
+        "rows_ok": sum(r["rows"] - r["skipped"] for r in results if r["ok"]),
+        "rows_failed": sum(r["rows"] for r in results if not r["ok"]),
+        "rows_skipped": sum(r["skipped"] for r in results if r["ok"]),
+        "chunks": results,
+    }
+
+
+def _max_rows() -> int:
+    # plafond PostgREST par réponse (db-max-rows, 1000 par défaut chez Supabase)
+    return max(1, int(os.environ.get("SUPABASE_MAX_ROWS") or "1000"))
+
+
+def _chunks(xs: List[Any], size: int) -> List[List[Any]]:
+    return [xs[i:i + size] for i in range(0, len(xs), size)]
+
+
+def fetch_known_videos(sb: Client, video_ids: List[str], region: str) -> Dict[str, Dict[str, Any]]:
+    """
+    tiktok_videos : (video_id, region) unique, hashtag, created_at,
+    product_title (null = vidéo sans produit vendable), last_seen_run.
+    """
+    ids = sorted({v for v in video_ids if v})
+    out: Dict[str, Dict[str, Any]] = {}
+    for chunk in _chunks(ids, 200):
+        res = (
+            sb.table("tiktok_videos")
+            .select("video_id,product_title,last_seen_run")
+            .eq("region", region)
+            .in_("video_id", chunk)
+            .execute()
+        )
+        for row in res.data or []:
+            out[str(row["video_id"])] = row
+    return out
+
+
+def upsert_known_videos(sb: Client, rows: List[Dict[str, Any]]) -> None:
+    for chunk in _chunks(rows, 500):
+        sb.table("tiktok_videos").upsert(chunk, on_conflict="video_id,region").execute()
+
+
+def upsert_hashtag_marks(sb: Client, marks: List[Dict[str, Any]]) -> None:
+    """
+    tiktok_hashtags : (hashtag, region) unique, last_created_at, videos_seen.
+    Le high-water mark ne recule jamais (max avec la valeur stockée).
+    """
+    if not marks:
         return
-    sb.table("products").upsert(rows, on_conflict="slug").execute()
+
+    region = marks[0]["region"]
+    res = (
+        sb.table("tiktok_hashtags")
+        .select("hashtag,last_created_at")
+        .eq("region", region)
+        .in_("hashtag", [m["hashtag"] for m in marks])
+        .execute()
+    )
+    stored = {r["hashtag"]: r.get("last_created_at") for r in res.data or []}
+
+    rows = []
+    for m in marks:
+        prev = stored.get(m["hashtag"])
+        last = m["last_created_at"]
+        if prev and (not last or str(prev) > last):
+            last = prev
+        rows.append({**m, "last_created_at": last})
+
+    sb.table("tiktok_hashtags").upsert(rows, on_conflict="hashtag,region").execute()
+
+
+def fetch_products_page(
+    sb: Client,
+    date_from: str,
+    date_to: str,
+    offset: int,
+    limit: int,
+    columns: str = "slug,title,run_date,score,score_breakdown,signals",
+) -> List[Dict[str, Any]]:
+    """
+    Historique scoré par run : lu dans product_analyses (signals / score_breakdown
+    n'y sont plus dans products). Clé (slug, run_date) : tri sur les deux pour une
+    pagination par offset stable.
+    """
+    res = (
+        sb.table("product_analyses")
+        .select(columns)
+        .gte("run_date", date_from)
+        .lte("run_date", date_to)
+        .order("slug")
+        .order("run_date")
+        .range(offset, offset + limit - 1)
+        .execute()
+    )
+    return res.data or []
+
+
+def fetch_legacy_products(sb: Client, date_from: str, date_to: str, page_size: int = 500) -> List[Dict[str, Any]]:
+    """
+    Rows products complets écrits avant product_analyses (blobs encore dans products,
+    signals non null), lus en entier avant toute écriture (offsets stables).
+    """
+    out: List[Dict[str, Any]] = []
+    offset = 0
+    while True:
+        res = (
+            sb.table("products")
+            .select("*")
+            .gte("run_date", date_from)
+            .lte("run_date", date_to)
+            .not_.is_("signals", "null")
+            .order("slug")
+            .order("run_date")
+            .range(offset, offset + page_size - 1)
+            .execute()
+        )
+        page = res.data or []
+        if not page:
+            break
+        out.extend(page)
+        offset += len(page)
+    return out
+
+
+def backfill_product_analyses(sb: Client, date_from: str, date_to: str) -> int:
+    """
+    Copie les rows products d'avant le découpage dans product_analyses (sans écraser
+    une analyse déjà présente), puis allège products (risks extraits, blobs à null) en
+    réécrivant les rows complets lus, sur slug. Par chunks UPSERT_CHUNK_BYTES, deux
+    upserts par chunk. Idempotent. Retourne le nombre de rows migrés.
+    """
+    legacy = fetch_legacy_products(sb, date_from, date_to)
+    for chunk in _byte_chunks(legacy, _upsert_chunk_bytes()):
+        heavy = [analysis_row(r) for r in chunk]
+        _, error = _upsert_with_retry(sb, "product_analyses", heavy, "slug,run_date", ignore_duplicates=True)
+        if error is None:
+            _, error = _upsert_with_retry(sb, "products", [list_row(r) for r in chunk], "slug")
+        if error:
+            raise RuntimeError(f"backfill_product_analyses ({len(chunk)} rows): {error}")
+    return len(legacy)
+
+
+def update_product_scores(sb: Client, rows: List[Dict[str, Any]], batch_size: int = 500) -> None:
+    """
+    rows : {slug, title, run_date, score, score_breakdown}. Par chunk (batch_size rows,
+    UPSERT_CHUNK_BYTES au plus) : upsert partiel de product_analyses sur (slug, run_date)
+    (analysis / signals ne sont pas touchés), puis un appel à la fonction SQL
+    update_product_scores qui reporte le score sur products quand (slug, run_date) est
+    le dernier run du slug, et y efface content_hash (row réécrit au prochain run).
+    Deux requêtes par chunk, quel que soit le nombre de rows.
+    """
+    for batch in _chunks(rows, batch_size):
+        for chunk in _byte_chunks(batch, _upsert_chunk_bytes()):
+            _, error = _upsert_with_retry(sb, "product_analyses", chunk, "slug,run_date")
+            if error is None:
+                scores = [{"slug": r["slug"], "run_date": str(r["run_date"]), "score": r["score"]} for r in chunk]
+                _, error = _rpc_with_retry(sb, "update_product_scores", {"rows": scores})
+            if error:
+                raise RuntimeError(f"update_product_scores ({len(chunk)} rows): {error}")
+
+
+def fetch_metric_histograms(
+    sb: Client,
+    region: str,
+    before_run_date: str,
+    runs: int,
+    metrics: Sequence[str],
+) -> Dict[str, List[List[int]]]:
+    """
+    metric_histograms : (run_date, region, metric) unique, counts int8[].
+    Histogrammes des `runs` derniers runs avant `before_run_date`, pour `metrics`
+    (une ligne par run et par métrique).
+    """
+    if runs <= 0 or not metrics:
+        return {}
+    res = (
+        sb.table("metric_histograms")
+        .select("run_date,metric,counts")
+        .eq("region", region)
+        .in_("metric", list(metrics))
+        .lt("run_date", before_run_date)
+        .order("run_date", desc=True)
+        .limit(runs * len(metrics))
+        .execute()
+    )
+    dates = sorted({r["run_date"] for r in res.data or []}, reverse=True)[:runs]
+    out: Dict[str, List[List[int]]] = {}
+    for r in res.data or []:
+        if r["run_date"] in dates:
+            out.setdefault(r["metric"], []).append(r.get("counts") or [])
+    return out
+
+
+def upsert_metric_histograms(sb: Client, run_date: str, region: str, hists: Dict[str, List[int]]) -> None:
+    rows = [{"run_date": run_date, "region": region, "metric": m, "counts": c} for m, c in hists.items()]
+    if rows:
+        sb.table("metric_histograms").upsert(rows, on_conflict="run_date,region,metric").execute()
+
+
+def fetch_previous_snapshots(
+    sb: Client,
+    video_ids: List[str],
+    region: str,
+    before_run_date: str,
+    since_run_date: str,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    tiktok_snapshots : (video_id, region, run_date) unique, run_at, metrics int8[]
+    ([views, likes, shares, comments]). Index (video_id, region, run_date desc).
+    Dernier snapshot de chaque vidéo dans [since_run_date, before_run_date[.
+    Une vidéo a jusqu'à un snapshot par run hebdo de la fenêtre : les chunks d'ids sont
+    taillés pour tenir dans une réponse (max_rows), et paginés au-delà. Sans ça, la
+    coupure à max_rows (triée run_date desc) perdrait les seuls snapshots de certaines vidéos.
+    """
+    ids = sorted({v for v in video_ids if v})
+    out: Dict[str, Dict[str, Any]] = {}
+    max_rows = _max_rows()
+    days = (date.fromisoformat(str(before_run_date)[:10]) - date.fromisoformat(str(since_run_date)[:10])).days
+    runs = max(1, days // 7 + 1)
+    for chunk in _chunks(ids, max(1, min(200, max_rows // runs))):
+        offset = 0
+        while True:
+            res = (
+                sb.table("tiktok_snapshots")
+                .select("video_id,run_date,run_at,metrics")
+                .eq("region", region)
+                .in_("video_id", chunk)
+                .lt("run_date", before_run_date)
+                .gte("run_date", since_run_date)
+                .order("run_date", desc=True)
+                .order("video_id")
+                .range(offset, offset + max_rows - 1)
+                .execute()
+            )
+            rows = res.data or []
+            # pages triées run_date desc : la première ligne vue par vidéo est la plus récente
+            for row in rows:
+                out.setdefault(str(row["video_id"]), row)
+            if len(rows) < max_rows:
+                break
+            offset += len(rows)
+    return out
+
+
+def upsert_snapshots(sb: Client, rows: List[Dict[str, Any]]) -> None:
+    for chunk in _chunks(rows, 1000):
+        sb.table("tiktok_snapshots").upsert(chunk, on_conflict="video_id,region,run_date").execute()
+
+
+def upsert_run_log(sb: Client, row: Dict[str, Any]) -> None:
+    """
+    runs : (run_date, region) unique, status, started_at, finished_at, stats jsonb
+    (timings par étape, compteurs du funnel, tokens LLM, http, upsert), errors jsonb.
+    """
+    sb.table("runs").upsert(row, on_conflict="run_date,region").execute()
+
+
+def fetch_run_log(sb: Client, run_date: str, region: str) -> Optional[Dict[str, Any]]:
+    res = (
+        sb.table("runs")
+        .select("status,started_at,finished_at,stats,errors")
+        .eq("run_date", run_date)
+        .eq("region", region)
+        .limit(1)
+        .execute()
+    )
+    return (res.data or [None])[0]
+
+
+def set_current_run_date(sb: Client, run_date: str) -> None:
+    """
+    settings : key = 'current_run_date', value {"v": "..."} (lu par la home de l'app).
+    """
+    sb.table("settings").upsert(
+        {"key": "current_run_date", "value": {"v": run_date}},
+        on_conflict="key",
+    ).execute()
+
+
+# colonnes "liste" de products (pas de blob analysis : seulement ses risques)
+LIST_COLUMNS = (
+    "id,run_date,created_at,title,slug,category,score,tags,sources,summary,"
+    "image_url,source_url,video_storage_url,mode,risks"
+)
+
+
+def fetch_run_products(sb: Client, run_date: str, limit: int) -> List[Dict[str, Any]]:
+    res = (
+        sb.table("products")
+        .select(LIST_COLUMNS)
+        .eq("run_date", run_date)
+        .eq("is_hidden", False)
+        .order("score", desc=True)
+        .limit(limit)
+        .execute()
+    )
+    return list(res.data or [])
+
+
+def fetch_leaderboard_dates(sb: Client, region: str, limit: int) -> List[str]:
+    res = (
+        sb.table("leaderboards")
+        .select("run_date")
+        .eq("region", region)
+        .order("run_date", desc=True)
+        .limit(limit)
+        .execute()
+    )
+    return [str(r["run_date"]) for r in res.data or []]
+
+
+def upsert_leaderboard(sb: Client, row: Dict[str, Any]) -> None:
+    """
+    leaderboards : (region, run_date) unique, generated_at, payload jsonb
+    ({run_date, run_dates, products[]}). Lecture front : region = X order run_date desc limit 2.
+    """
+    sb.table("leaderboards").upsert(row, on_conflict="region,run_date").execute()
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import re
+import unicodedata
+
+from slugify import slugify
+
+# Clé canonique d'une caption TikTok : deux reposts qui ne diffèrent que par les hashtags,
+# emojis, @mentions, la ponctuation, les accents ou un "lien en bio" donnent la même clé.
+# La caption d'origine n'est jamais modifiée (affichage / extraction LLM).
+
+_URL_RE = re.compile(r"https?://\S+|www\.\S+")
+_TAG_RE = re.compile(r"[#@][\w.]+")
+_CTA_RE = re.compile(
+    r"\b(?:(?:(?:link|lien)\s+)?(?:in|en|dans\s+(?:la|ma))\s+(?:bio|description)"
+    r"|code\s+promo(?:\s+en\s+bio)?|shop\s+now|swipe\s+up)\b"
+)
+_ACCENT_RE = re.compile("[\u0300-\u036f]")
+# tout ce qui n'est ni lettre, ni chiffre, ni espace : ponctuation, emojis, symboles, ZWJ
+_NON_WORD_RE = re.compile(r"[^\w\s]|_")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def canonical_caption(text: str) -> str:
+    if not text:
+        return ""
+    s = unicodedata.normalize("NFKD", text).casefold()
+    s = _ACCENT_RE.sub("", s)
+    s = _URL_RE.sub(" ", s)
+    s = _TAG_RE.sub(" ", s)
+    s = s.replace("’", "'")
+    s = _NON_WORD_RE.sub(" ", s)
+    s = _CTA_RE.sub(" ", s)
+    return _SPACE_RE.sub(" ", s).strip()
+
+
+# slug produit = clé d'upsert products (on_conflict="slug") et URL /product/[slug]
+SLUG_MAX_LENGTH = 80
+
+
+def product_slug(title: str) -> str:
+    """
+    Slug unique pour tout le pipeline (fusion par produit, upsert, enrich_product_payload).
+    """
+    return slugify(title or "", max_length=SLUG_MAX_LENGTH)
@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import io
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import httpx
+import numpy as np
+
+from scripts.pipeline.candidate import Candidate
+from scripts.pipeline.local_state import read_json, write_json
+from scripts.pipeline.media import default_storage, media_concurrency, media_timeout
+
+try:
+    import av  # optionnel : décodage des keyframes (pip install av)
+except ImportError:
+    av = None
+
+try:
+    from PIL import Image  # optionnel : redimensionnement + WebP (pip install pillow)
+except ImportError:
+    Image = None
+
+# Vignettes produit tirées de la vidéo gagnante : on ne lit que le début du mp4 (Range),
+# on décode quelques keyframes (skip des frames non-clé), on garde la plus nette
+# (variance du laplacien) et on l'écrit en WebP à deux largeurs (liste / fiche produit).
+# Décodage dans un pool de processus ; résultat rangé sous le hash de la vidéo :
+#   thumbs/<hash>/<largeur>.webp
+# Une vidéo déjà traitée (index local ou fichier présent dans le bucket) n'est jamais ré-extraite.
+
+THUMB_INDEX_FILE = "thumb_index.json"
+
+# vidéo miroitée par pipeline/media : le hash du contenu est dans le chemin
+_MIRRORED_RE = re.compile(r"/videos/[0-9a-f]{2}/([0-9a-f]{64})\.mp4$")
+
+
+def thumbnails_enabled() -> bool:
+    return (os.environ.get("THUMBNAILS") or "1").strip() != "0"
+
+
+def thumb_widths() -> Tuple[int, ...]:
+    # première largeur = liste (image_url), dernière = fiche produit
+    raw = os.environ.get("THUMB_WIDTHS") or "320,720"
+    return tuple(sorted({int(x) for x in raw.split(",") if x.strip()}))
+
+
+def _range_bytes() -> int:
+    return int(os.environ.get("THUMB_RANGE_BYTES") or str(3 * 1024 * 1024))
+
+
+def _max_keyframes() -> int:
+    return max(1, int(os.environ.get("THUMB_KEYFRAMES") or "6"))
+
+
+def _quality() -> int:
+    return int(os.environ.get("THUMB_WEBP_QUALITY") or "80")
+
+
+def _workers() -> int:
+    return max(1, int(os.environ.get("THUMB_WORKERS") or str(os.cpu_count() or 1)))
+
+
+def thumb_path(key: str, width: int) -> str:
+    return f"thumbs/{key}/{width}.webp"
+
+
+def video_key(url: str) -> Optional[str]:
+    m = _MIRRORED_RE.search(url or "")
+    return m.group(1) if m else None
+
+
+def sharpness(gray: np.ndarray) -> float:
+    """
+    Variance du laplacien (4-voisins) sur l'image sous-échantillonnée 1/2 :
+    une frame floue, noire ou en fondu a une variance faible.
+    """
+    g = gray[::2, ::2].astype(np.float32)
+    if g.shape[0] < 3 or g.shape[1] < 3:
+        return 0.0
+    lap = 4 * g[1:-1, 1:-1] - g[:-2, 1:-1] - g[2:, 1:-1] - g[1:-1, :-2] - g[1:-1, 2:]
+    return float(lap.var())
+
+
+def extract_thumbnails(data: bytes, widths: Tuple[int, ...], max_keyframes: int, quality: int) -> Dict[int, bytes]:
+    """
+    (Exécuté dans le pool.) Début de mp4 -> {largeur: webp} de la keyframe la plus nette.
+    Dict vide si rien n'est décodable (moov en fin de fichier, codec inconnu...).
+    """
+    best = None
+    best_score = -1.0
+    try:
+        with av.open(io.BytesIO(data), mode="r") as container:
+            stream = container.streams.video[0]
+            stream.codec_context.skip_frame = "NONKEY"
+            for n, frame in enumerate(container.decode(stream)):
+                score = sharpness(frame.to_ndarray(format="gray"))
+                if score > best_score:
+                    best, best_score = frame.to_image(), score
+                if n + 1 >= max_keyframes:
+                    break
+    except Exception:
+        # range tronqué en plein GOP : on garde les keyframes déjà décodées
+        pass
+
+    if best is None:
+        return {}
+
+    out: Dict[int, bytes] = {}
+    for w in widths:
+        img = best
+        if img.width > w:
+            img = img.resize((w, max(1, round(img.height * w / img.width))), Image.LANCZOS)
+        buf = io.BytesIO()
+        img.save(buf, "WEBP", quality=quality, method=4)
+        out[w] = buf.getvalue()
+    return out
+
+
+async def fetch_head(client: httpx.AsyncClient, url: str, nbytes: int) -> bytes:
+    """
+    Premiers `nbytes` de l'URL (Range ; si le serveur l'ignore, flux coupé à nbytes).
+    """
+    async with client.stream("GET", url, headers={"Range": f"bytes=0-{nbytes - 1}"}) as r:
+        r.raise_for_status()
+        buf = bytearray()
+        async for chunk in r.aiter_bytes():
+            buf.extend(chunk)
+            if len(buf) >= nbytes:
+                break
+        return bytes(buf[:nbytes])
+
+
+async def _thumb_one(
+    client: httpx.AsyncClient,
+    storage: Any,
+    pool: ProcessPoolExecutor,
+    sem: asyncio.Semaphore,
+    index: Dict[str, Dict[str, str]],
+    inflight: Set[str],
+    url: str,
+    widths: Tuple[int, ...],
+    stats: Dict[str, int],
+) -> Optional[str]:
+    """
+    Retourne le hash vidéo dont les vignettes sont dans `index`, None sinon.
+    """
+    async def stored(key: str) -> Optional[Dict[str, str]]:
+        # entrée d'index complète pour les largeurs courantes (THUMB_WIDTHS peut changer)
+        if all(str(w) in index.get(key, {}) for w in widths):
+            return index[key]
+        if await storage.exists(thumb_path(key, widths[-1])):
+            index[key] = {str(w): storage.public_url(thumb_path(key, w)) for w in widths}
+            return index[key]
+        return None
+
+    key = video_key(url)
+    try:
+        if key:
+            if await stored(key):
+                stats["cached"] += 1
+                return key
+
+        async with sem:
+            data = await fetch_head(client, url, _range_bytes())
+        stats["bytes_fetched"] += len(data)
+
+        if not key:
+            # vidéo non miroitée : hash du début du fichier
+            key = hashlib.sha256(data).hexdigest()
+            if await stored(key):
+                stats["cached"] += 1
+                return key
+
+        # même vidéo sous deux produits dans ce run : une seule extraction
+        if key in inflight:
+            return key
+        inflight.add(key)
+
+        loop = asyncio.get_running_loop()
+        thumbs = await loop.run_in_executor(pool, extract_thumbnails, data, widths, _max_keyframes(), _quality())
+        if not thumbs:
+            stats["undecodable"] += 1
+            return None
+
+        urls: Dict[str, str] = {}
+        for w, webp in thumbs.items():
+            await storage.upload(thumb_path(key, w), webp, "image/webp")
+            urls[str(w)] = storage.public_url(thumb_path(key, w))
+        index[key] = urls
+        stats["extracted"] += 1
+        return key
+    except Exception as e:
+        stats["errors"] += 1
+        print(f"⚠️ thumbnail ({url}):", e)
+        return None
+
+
+async def _thumbnails(winners: List[Candidate], storage: Any = None) -> Dict[str, int]:
+    stats = {"extracted": 0, "cached": 0, "undecodable": 0, "errors": 0, "bytes_fetched": 0}
+    index: Dict[str, Dict[str, str]] = read_json(THUMB_INDEX_FILE, {}) or {}
+    widths = thumb_widths()
+    sem = asyncio.Semaphore(media_concurrency())
+    inflight: Set[str] = set()
+    targets = [w for w in winners if w.tk.video_storage_url]
+
+    with ProcessPoolExecutor(max_workers=min(_workers(), max(1, len(targets)))) as pool:
+        async with httpx.AsyncClient(timeout=media_timeout(), follow_redirects=True) as client:
+            storage = storage or default_storage(client)
+            results = await asyncio.gather(*(
+                _thumb_one(client, storage, pool, sem, index, inflight, w.tk.video_storage_url, widths, stats)
+                for w in targets
+            ))
+
+    # lecture après gather : un doublon in-flight récupère les vignettes du premier
+    for w, key in zip(targets, results):
+        urls = index.get(key) if key else None
+        if urls and all(str(x) in urls for x in widths):
+            w.image_url = urls[str(widths[0])]
+            w.image_detail_url = urls[str(widths[-1])]
+            w.image_source = "video_keyframe"
+
+    write_json(THUMB_INDEX_FILE, index)
+    return stats
+
+
+def attach_thumbnails(winners: List[Candidate], storage: Any = None) -> Dict[str, int]:
+    """
+    Vignettes WebP des gagnants ; image_url = plus petite largeur (liste), image_detail_url
+    = plus grande (fiche produit). Sans vignette, les deux restent la cover TikTok.
+    Retourne les compteurs (extracted, cached, undecodable, errors, bytes_fetched).
+    """
+    if not winners:
+        return {}
+    if av is None or Image is None:
+        print("⚠️ thumbnails: av / pillow non installés, vignettes ignorées")
+        return {}
+    return asyncio.run(_thumbnails(winners, storage))
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, List, Optional
+
+from scripts.pipeline.candidate import Candidate
+from scripts.pipeline.incremental import video_id_of
+from scripts.pipeline.scoring import ScoringContext
+
+# Snapshot compact par vidéo et par run : metrics = [views, likes, shares, comments] (int8[]).
+# La vélocité se lit par lookup (video_id, region) sur le snapshot précédent, sans relire l'historique.
+SNAPSHOT_METRICS = ("views", "likes", "shares", "comments")
+
+
+def snapshot_lookback_days() -> int:
+    return max(1, int(os.environ.get("VELOCITY_LOOKBACK_DAYS") or "35"))
+
+
+def min_snapshot_hours() -> float:
+    # en dessous (re-run le même jour), le delta est trop bruité : pas de vélocité
+    return max(1.0, float(os.environ.get("VELOCITY_MIN_HOURS") or "12"))
+
+
+def pack_metrics(c: Candidate) -> List[int]:
+    tk = c.tk
+    return [tk.views, tk.likes, tk.shares, tk.comments]
+
+
+def snapshot_rows(candidates: List[Candidate], run_date: str, run_at: str, region: str) -> List[Dict[str, Any]]:
+    """
+    Lignes tiktok_snapshots du run (une par vidéo).
+    """
+    rows: Dict[str, Dict[str, Any]] = {}
+    for c in candidates:
+        vid = video_id_of(c)
+        if not vid:
+            continue
+        rows[vid] = {
+            "video_id": vid,
+            "region": region,
+            "run_date": run_date,
+            "run_at": run_at,
+            "metrics": pack_metrics(c),
+        }
+    return list(rows.values())
+
+
+def _delta(now: int, prev: Any) -> int:
+    try:
+        return max(now - int(prev), 0)
+    except Exception:
+        return 0
+
+
+def attach_velocity(
+    candidates: List[Candidate],
+    previous: Dict[str, Dict[str, Any]],
+    ctx: ScoringContext,
+) -> int:
+    """
+    Pose views_per_hour / shares_per_hour (delta depuis le snapshot précédent) sur les
+    candidats déjà vus. Les autres gardent None : pas de points de vélocité.
+    Retourne le nombre de candidats avec une vélocité snapshot.
+    """
+    min_hours = min_snapshot_hours()
+    n = 0
+    for c in candidates:
+        snap: Optional[Dict[str, Any]] = previous.get(video_id_of(c))
+        if not snap:
+            continue
+        metrics = snap.get("metrics") or []
+        at_us = ctx.parse_us(snap.get("run_at"))
+        if len(metrics) != len(SNAPSHOT_METRICS) or at_us is None:
+            continue
+
+        hours = (ctx.now_us - at_us) / 3_600_000_000
+        if hours < min_hours:
+            continue
+
+        c.tk.views_per_hour = round(_delta(c.tk.views, metrics[0]) / hours, 2)
+        c.tk.shares_per_hour = round(_delta(c.tk.shares, metrics[2]) / hours, 2)
+        n += 1
+    return n
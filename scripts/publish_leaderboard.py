@@ -0,0 +1,37 @@
+"""
+Republie le classement (table leaderboards) sans relancer le pipeline, par exemple
+après avoir démasqué un produit (le masquage est appliqué par trigger) ou modifié des
+scores à la main.
+
+  python -m scripts.publish_leaderboard [--region FR] [--run-date 2026-10-19]
+
+Sans --run-date : le classement le plus récent de la région.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+
+from scripts.pipeline.leaderboard import publish_leaderboard, republish_latest
+from scripts.pipeline.supabase_db import get_supabase
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Republie le classement courant")
+    ap.add_argument("--region", default=os.environ.get("RUN_REGION", "FR"))
+    ap.add_argument("--run-date", default=None)
+    args = ap.parse_args()
+
+    sb = get_supabase()
+    if args.run_date:
+        n = publish_leaderboard(sb, args.run_date, args.region)
+        print("LEADERBOARD ✅", {"region": args.region, "run_date": args.run_date, "products": n})
+        return
+
+    run_date = republish_latest(sb, args.region)
+    print("LEADERBOARD ✅" if run_date else "LEADERBOARD ⚠️ aucun classement publié", {"region": args.region, "run_date": run_date})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Re-scoring hors ligne des produits stockés (aucun appel LLM ni Apify).
+
+  python -m scripts.rescore --from 2026-09-01 --to 2026-10-19 --weights weights.json [--dry-run]
+
+Migre d'abord dans product_analyses les rows products écrits avant le découpage
+(cf. supabase_db.backfill_product_analyses), puis relit product_analyses.signals par
+pages, recalcule score / score_breakdown avec les poids du fichier (par-dessus
+scoring.base_weights, cf. SCORING_VELOCITY) et ne réécrit que les lignes dont le
+score change (product_analyses, et products pour le dernier run de chaque slug), puis
+republie le classement courant de RUN_REGION s'il est touché.
+Normalisation par run_date (comme le run d'origine), heure de référence = run_date à
+RESCORE_REF_HOUR UTC (heure du cron hebdo).
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from scripts.pipeline.leaderboard import republish_latest
+from scripts.pipeline.scoring import ScoringContext, base_weights, load_weights
+from scripts.pipeline.scoring_np import breakdowns, score_arrays, signal_arrays
+from scripts.pipeline.supabase_db import (
+    backfill_product_analyses,
+    fetch_legacy_products,
+    fetch_products_page,
+    get_supabase,
+    update_product_scores,
+)
+
+
+def _region() -> str:
+    return os.environ.get("RUN_REGION", "FR")
+
+
+def _ref_hour() -> int:
+    return int(os.environ.get("RESCORE_REF_HOUR") or "7")
+
+
+def _run_reference_time(run_date: str) -> datetime:
+    d = datetime.fromisoformat(str(run_date)[:10])
+    return d.replace(hour=_ref_hour(), tzinfo=timezone.utc)
+
+
+def rescore_rows(rows: List[Dict[str, Any]], weights: Dict[str, float]) -> List[Dict[str, Any]]:
+    """
+    Recalcule les scores d'un ensemble de lignes products et retourne celles qui changent.
+    """
+    by_run: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for r in rows:
+        by_run[str(r.get("run_date") or "")].append(r)
+
+    changed: List[Dict[str, Any]] = []
+    for run_date, group in by_run.items():
+        if not run_date:
+            continue
+
+        ctx = ScoringContext(_run_reference_time(run_date), weights)
+        result = score_arrays(signal_arrays(group, ctx), ctx=ctx)
+
+        for r, score, bd in zip(group, result["score"].tolist(), breakdowns(result)):
+            if score == r.get("score") and bd == (r.get("score_breakdown") or {}):
+                continue
+            changed.append(
+                {
+                    "slug": r["slug"],
+                    "title": r.get("title"),
+                    "run_date": r["run_date"],
+                    "score": score,
+                    "score_breakdown": bd,
+                }
+            )
+    return changed
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Re-scoring hors ligne de products")
+    ap.add_argument("--from", dest="date_from", required=True)
+    ap.add_argument("--to", dest="date_to", required=True)
+    ap.add_argument("--weights", default=None, help="fichier JSON de poids")
+    ap.add_argument("--page-size", type=int, default=1000)
+    ap.add_argument("--batch-size", type=int, default=500)
+    ap.add_argument("--dry-run", action="store_true")
+    args = ap.parse_args()
+
+    weights = load_weights(args.weights)
+    sb = get_supabase()
+
+    t0 = time.perf_counter()
+    # rows d'avant product_analyses (blobs encore dans products) : migrés d'abord,
+    # sinon ils sortiraient du rescoring. En --dry-run, lus tels quels sans écriture.
+    legacy: List[Dict[str, Any]] = []
+    migrated = 0
+    if args.dry_run:
+        legacy = fetch_legacy_products(sb, args.date_from, args.date_to)
+    else:
+        migrated = backfill_product_analyses(sb, args.date_from, args.date_to)
+
+    rows: List[Dict[str, Any]] = []
+    offset = 0
+    while True:
+        page = fetch_products_page(sb, args.date_from, args.date_to, offset, args.page_size)
+        # arrêt sur page vide seulement : PostgREST plafonne une page à max_rows (1000 par
+        # défaut), une page plus courte que --page-size n'est pas forcément la dernière
+        if not page:
+            break
+        rows.extend(page)
+        offset += len(page)
+    seen = {(r["slug"], str(r["run_date"])) for r in rows}
+    rows.extend(r for r in legacy if (r["slug"], str(r["run_date"])) not in seen)
+    t_read = time.perf_counter() - t0
+
+    # tout le range est chargé avant scoring : les maxima se calculent par run_date complet
+    changed = rescore_rows(rows, weights)
+    t_score = time.perf_counter() - t0 - t_read
+
+    republished = None
+    if changed and not args.dry_run:
+        update_product_scores(sb, changed, args.batch_size)
+        # le classement publié est un snapshot : republié si son run_date a bougé
+        try:
+            republished = republish_latest(sb, _region(), {r["run_date"] for r in changed})
+        except Exception as e:
+            print("⚠️ republish_latest:", e)
+
+    print(
+        "RESCORE ✅",
+        {
+            "range": [args.date_from, args.date_to],
+            "weights": {**base_weights(), **weights},
+            "rows_read": len(rows),
+            "legacy_rows": len(legacy) if args.dry_run else migrated,
+            "rows_changed": len(changed),
+            "written": 0 if args.dry_run else len(changed),
+            "leaderboard_republished": republished,
+            "read_s": round(t_read, 2),
+            "score_s": round(t_score, 2),
+            "total_s": round(time.perf_counter() - t0, 2),
+        },
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,55 @@
 from __future__ import annotations
 
+import argparse
 import os
-from datetime import date
-from typing import Dict, List
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
 from slugify import slugify
 
-from scripts.connectors.tiktok_hashtag_apify import fetch_tiktok_candidates_from_hashtags
-from scripts.pipeline.merge import merge_candidates
-from scripts.pipeline.scoring import score_candidate
-from scripts.pipeline.supabase_db import get_supabase, upsert_products
-from scripts.pipeline.ai import extract_product_name, is_sellable_product, generate_analysis
+from scripts.connectors.http_client import http_stats
+from scripts.connectors.tiktok_hashtag_apify import (
+    attach_winner_videos,
+    fetch_tiktok_candidates_from_hashtags,
+)
+from scripts.pipeline.candidate import Candidate
+from scripts.pipeline.checkpoints import Checkpoints, latest_unfinished
+from scripts.pipeline.media import media_mirror_enabled, mirror_winner_media
+from scripts.pipeline.merge import merge_by_key, merge_candidates
+from scripts.pipeline.scoring import ScoringContext
+from scripts.pipeline.text import product_slug
+from scripts.pipeline.thumbnails import attach_thumbnails, thumbnails_enabled
+from scripts.pipeline.scoring_np import attach_distribution, score_candidates_batch
+from scripts.pipeline.supabase_db import (
+    fetch_known_videos,
+    fetch_metric_histograms,
+    fetch_previous_snapshots,
+    get_supabase,
+    set_current_run_date,
+    upsert_hashtag_marks,
+    upsert_known_videos,
+    upsert_metric_histograms,
+    upsert_products,
+    upsert_snapshots,
+)
+from scripts.pipeline.distributions import RANK_METRICS
+from scripts.pipeline.diversity import max_per_category, select_top_n
+from scripts.pipeline.funnel import confirm_by_score, funnel_margin
+from scripts.pipeline.incremental import (
+    hashtag_watermarks,
+    incremental_enabled,
+    memo_rows,
+    split_known,
+    video_id_of,
+)
+from scripts.pipeline.velocity import attach_velocity, snapshot_lookback_days, snapshot_rows
+from scripts.pipeline.leaderboard import publish_leaderboard
+from scripts.pipeline.run_log import RunLog
+from scripts.pipeline.ai import extract_product_name, is_sellable_product, generate_analysis, llm_usage
 
 TOP_N = int(os.environ.get("TOP_N", "20"))
 REGION = os.environ.get("RUN_REGION", "FR")
+RANK_WINDOW = int(os.environ.get("SCORING_RANK_WINDOW", "4"))
 
 
 def _norm_text(s: str) -> str:
@@ -46,96 +83,280 @@ def make_tags(title: str) -> List[str]:
     return [w for w in slugify(title).split("-")[:6] if w]
 
 
-def main() -> None:
+def _candidates(records: List[Dict]) -> List[Candidate]:
+    return [Candidate.from_dict(r) for r in records]
+
+
+def _records(candidates: List[Candidate]) -> List[Dict]:
+    return [c.to_dict() for c in candidates]
+
+
+def main(resume: bool = False) -> None:
     sb = get_supabase()
     run_date = str(date.today())
 
-    raw = fetch_tiktok_candidates_from_hashtags()
-    merged = merge_candidates(raw)
-
-    sellable: List[dict] = []
-    for c in merged:
-        caption = c.get("title", "")
-        product = extract_product_name(caption, geo=REGION)
-        if not product:
-            continue
-        if not is_sellable_product(product, geo=REGION):
-            continue
-
-        c["title"] = product
-        sellable.append(c)
-
-    # scoring max (sur sellable)
-    max_views = max([int((x.get("signals", {}).get("tiktok_hashtag", {}).get("views", 0) or 0)) for x in sellable] + [1])
-    max_likes = max([int((x.get("signals", {}).get("tiktok_hashtag", {}).get("likes", 0) or 0)) for x in sellable] + [1])
-    max_shares = max([int((x.get("signals", {}).get("tiktok_hashtag", {}).get("shares", 0) or 0)) for x in sellable] + [1])
-
-    for c in sellable:
-        s = score_candidate(c, max_views=max_views, max_likes=max_likes, max_shares=max_shares)
-        c["score"] = s["score"]
-        c["score_breakdown"] = s["score_breakdown"]
-
-        title = c["title"]
-        c["category"] = infer_category(title)
-        c["tags"] = make_tags(title)
-
-    sellable.sort(key=lambda x: x.get("score", 0), reverse=True)
-    winners = sellable[:TOP_N]
-
-    rows: List[Dict] = []
-    for w in winners:
-        title = w["title"]
-        category = w.get("category", "autre")
-        tags = w.get("tags", [])
-
-        analysis = generate_analysis(
-            {
-                "title": title,
-                "category": category,
-                "tags": tags,
-                "sources": w.get("sources", []),
-                "signals": w.get("signals", {}),
-            },
-            geo=REGION,
-        )
-
-        summary = (analysis.get("positioning", {}) or {}).get("main_promise", "") or ""
-
-        rows.append(
-            {
+    # --resume : reprend le dernier run inachevé de la région (même s'il date d'hier)
+    if resume:
+        run_date = latest_unfinished(REGION) or run_date
+    ckpt = Checkpoints(run_date, REGION, resume=resume)
+    if ckpt.completed():
+        print("↪️ reprise", {"run_date": run_date, "region": REGION, "stages": ckpt.completed()})
+
+    # ligne `runs` mise à jour à chaque étape terminée
+    log = RunLog(sb, run_date, REGION, resume=resume)
+    log.count(resumed_stages=ckpt.completed())
+    # seul endroit où le run est clos (finish) : _run lève, ne finit jamais en échec
+    try:
+        _run(sb, run_date, ckpt, log)
+    except BaseException as e:
+        if log.status != "failed":
+            log.error("main", e)
+        log.finish("failed", llm=llm_usage(), http=http_stats())
+        raise
+
+
+def _run(sb, run_date: str, ckpt: Checkpoints, log: RunLog) -> None:
+    # 1) scrape Apify (+ vélocité par vidéo, avant la fusion qui somme les métriques)
+    if ckpt.has("raw"):
+        records, meta = ckpt.load("raw")
+        raw = _candidates(records)
+        # même heure de référence que le run d'origine (pré-score identique)
+        scoring_ctx = ScoringContext(datetime.fromisoformat(meta["now"]))
+        velocity_known = int(meta.get("velocity_known") or 0)
+    else:
+        with log.stage("scrape"):
+            raw = fetch_tiktok_candidates_from_hashtags()
+
+            # une seule heure de référence pour tout le run (recency reproductible)
+            scoring_ctx = ScoringContext()
+
+            # vélocité : delta depuis le dernier snapshot de chaque vidéo (SCORING_VELOCITY=1)
+            velocity_known = 0
+            try:
+                since = str(date.fromisoformat(run_date) - timedelta(days=snapshot_lookback_days()))
+                previous = fetch_previous_snapshots(sb, [video_id_of(c) for c in raw], REGION, run_date, since)
+                velocity_known = attach_velocity(raw, previous, scoring_ctx)
+            except Exception as e:
+                log.warn("fetch_previous_snapshots", e)
+            try:
+                upsert_snapshots(sb, snapshot_rows(raw, run_date, scoring_ctx.now.isoformat(), REGION))
+            except Exception as e:
+                log.warn("upsert_snapshots", e)
+
+            ckpt.save("raw", _records(raw), {"now": scoring_ctx.now.isoformat(), "velocity_known": velocity_known})
+    log.count(candidates_raw=len(raw), velocity_from_snapshots=velocity_known)
+
+    # 2) fusion : même vidéo (max) et reposts (même caption au hashtag / emoji /
+    # "lien en bio" près, sommés) avant le LLM
+    merge_stats: Dict[str, int] = {}
+    if ckpt.has("merged"):
+        records, merge_stats = ckpt.load("merged")
+        merged = _candidates(records)
+    else:
+        with log.stage("merge"):
+            merged = merge_candidates(raw, merge_stats)
+            ckpt.save("merged", _records(merged), merge_stats)
+    log.count(candidates_merged=len(merged), reposts_collapsed=merge_stats.get("reposts_collapsed", 0))
+
+    # distribution du run (percentiles en mode SCORING_NORM=rank), mélangée aux runs précédents
+    with log.stage("score"):
+        history: Dict[str, List[List[int]]] = {}
+        if scoring_ctx.norm == "rank":
+            try:
+                history = fetch_metric_histograms(sb, REGION, run_date, RANK_WINDOW, RANK_METRICS)
+            except Exception as e:
+                log.warn("fetch_metric_histograms", e)
+        run_hists = attach_distribution(scoring_ctx, merged, history)
+        if not ckpt.has("sellable"):
+            try:
+                upsert_metric_histograms(sb, run_date, REGION, run_hists)
+            except Exception as e:
+                log.warn("upsert_metric_histograms", e)
+
+    # 3) pré-score sur les signaux TikTok seuls, puis extraction LLM par vagues
+    # dans l'ordre du score : le coût LLM est borné par TOP_N, pas par le nb de candidats
+    quota = max_per_category()
+    if ckpt.has("sellable"):
+        records, funnel = ckpt.load("sellable")
+        sellable = _candidates(records)
+    else:
+        with log.stage("score"):
+            score_candidates_batch(merged, scoring_ctx)
+
+        with log.stage("funnel"):
+            # vidéos déjà vues : produit stocké réutilisé, pas d'appel LLM
+            known: Dict[str, Dict] = {}
+            if incremental_enabled():
+                try:
+                    known = fetch_known_videos(sb, [video_id_of(c) for c in merged], REGION)
+                except Exception as e:
+                    log.warn("fetch_known_videos", e)
+
+            fresh, refreshed, known_rejected = split_known(merged, known, run_date)
+
+            def _check(c: Candidate) -> Optional[str]:
+                t0 = time.perf_counter()
+                product = extract_product_name(c.title, geo=REGION)
+                t1 = time.perf_counter()
+                log.add_time("extract", t1 - t0)
+                if not product:
+                    return None
+                ok = is_sellable_product(product, geo=REGION)
+                log.add_time("sellability", time.perf_counter() - t1)
+                return product if ok else None
+
+            sellable, checked = confirm_by_score(
+                fresh,
+                list(refreshed),
+                TOP_N + funnel_margin(),
+                _check,
+                group=lambda c: infer_category(c.title),
+                max_per_group=quota,
+            )
+
+            extracted: Dict[str, Optional[str]] = {video_id_of(c): c.title for c in refreshed}
+            for c, product in checked:
+                vid = video_id_of(c)
+                if vid:
+                    extracted[vid] = product
+
+            if incremental_enabled():
+                try:
+                    upsert_known_videos(sb, memo_rows(merged, extracted, run_date, REGION))
+                    upsert_hashtag_marks(sb, hashtag_watermarks(merged, REGION))
+                except Exception as e:
+                    log.warn("incremental state", e)
+
+            funnel = {
+                "candidates_new": len(fresh),
+                "candidates_refreshed": len(refreshed),
+                "candidates_known_rejected": known_rejected,
+                "candidates_llm_checked": len(checked),
+                "candidates_sellable": len(sellable),
+            }
+            ckpt.save("sellable", _records(sellable), funnel)
+    log.count(**funnel)
+
+    # 4) score final et sélection du top-N
+    if ckpt.has("scored"):
+        records, selection = ckpt.load("scored")
+        winners = _candidates(records)
+    else:
+        with log.stage("score"):
+            # second passage : même produit extrait de captions différentes -> traction cumulée
+            # (un seul generate_analysis et une seule ligne products par slug)
+            sellable = merge_by_key(sellable, lambda c: product_slug(c.title))
+
+            # score final : normalisation recalculée sur les produits confirmés
+            score_candidates_batch(sellable, scoring_ctx)
+
+            for c in sellable:
+                c.category = infer_category(c.title)
+                c.tags = make_tags(c.title)
+
+            # top-N par tas borné, quota par catégorie appliqué pendant la sélection
+            winners = select_top_n(sellable, TOP_N, quota)
+
+        with log.stage("videos"):
+            # mp4 téléchargés seulement maintenant (TIKTOK_VIDEO_DOWNLOAD=lazy)
+            videos_attached = attach_winner_videos(winners)
+
+        media_stats: Dict[str, int] = {}
+        if media_mirror_enabled():
+            with log.stage("media"):
+                # mp4 + cover copiés chez nous : les URLs TikTok / Apify signées expirent
+                media_stats = mirror_winner_media(winners)
+
+        thumb_stats: Dict[str, int] = {}
+        if thumbnails_enabled():
+            with log.stage("thumbnails"):
+                # vignettes WebP extraites des keyframes (après le miroir : clé = hash de la vidéo)
+                thumb_stats = attach_thumbnails(winners)
+
+        selection = {
+            "products_confirmed": len(sellable),
+            "videos_attached": videos_attached,
+            "media": media_stats,
+            "thumbnails": thumb_stats,
+        }
+        ckpt.save("scored", _records(winners), selection)
+    log.count(products_confirmed=selection["products_confirmed"], topN=len(winners), videos_attached=selection["videos_attached"])
+    log.count(media=selection.get("media") or {}, thumbnails=selection.get("thumbnails") or {})
+
+    # 5) analyse LLM par produit, chaque row checkpointé dès qu'il est prêt
+    with log.stage("analysis"):
+        rows: List[Dict] = ckpt.reopen("analyses")
+        done = {r.get("slug") for r in rows}
+        for w in winners:
+            title = w.title
+            if product_slug(title) in done:
+                continue
+            signals = w.signals()
+
+            analysis = generate_analysis(
+                {
+                    "title": title,
+                    "category": w.category,
+                    "tags": w.tags,
+                    "sources": w.sources,
+                    "signals": signals,
+                },
+                geo=REGION,
+            )
+
+            summary = (analysis.get("positioning", {}) or {}).get("main_promise", "") or ""
+
+            row = {
                 "run_date": run_date,
                 "title": title,
-                "slug": slugify(title)[:80],
-                "category": category,
-                "tags": tags,
-                "sources": w.get("sources", []),
-                "score": int(w.get("score", 0)),
-                "score_breakdown": w.get("score_breakdown", {}),
+                "slug": product_slug(title),
+                "category": w.category,
+                "tags": w.tags,
+                "sources": w.sources,
+                "score": int(w.score),
+                "score_breakdown": w.score_breakdown,
                 "summary": summary,
-                "signals": w.get("signals", {}),
+                "signals": signals,
                 "analysis": analysis,
-                "image_url": None,
-                "image_source": None,
-                "source_url": (w.get("signals", {}).get("tiktok_hashtag", {}) or {}).get("video_url"),
-                "video_storage_url": (w.get("signals", {}).get("tiktok_hashtag", {}) or {}).get("video_storage_url"),  # ✅ AJOUT
+                "image_url": w.image_url,
+                "image_detail_url": w.image_detail_url,
+                "image_source": w.image_source,
+                "source_url": w.tk.video_url,
+                "video_storage_url": w.tk.video_storage_url,  # ✅ AJOUT
                 "is_hidden": False,
             }
-        )
+            rows.append(row)
+            ckpt.append("analyses", row)
+
+    with log.stage("upsert"):
+        upsert_stats = upsert_products(sb, rows)
+    log.count(upsert=upsert_stats)
+
+    # chunks déjà écrits conservés ; le run est marqué en échec par main pour les autres
+    # (checkpoints gardés : --resume ne refait que l'upsert)
+    if upsert_stats["rows_failed"]:
+        raise RuntimeError(f"upsert_products: {upsert_stats['rows_failed']} row(s) non écrite(s)")
+
+    try:
+        set_current_run_date(sb, run_date)
+    except Exception as e:
+        log.warn("set_current_run_date", e)
+
+    # classement publié pour le front (une lecture au lieu de deux requêtes products)
+    with log.stage("publish"):
+        try:
+            log.count(leaderboard_products=publish_leaderboard(sb, run_date, REGION))
+        except Exception as e:
+            log.warn("publish_leaderboard", e)
 
-    upsert_products(sb, rows)
+    log.finish("ok", llm=llm_usage(), http=http_stats())
+    print("OK ✅", log.row())
 
-    print(
-        "OK ✅",
-        {
-            "run_date": run_date,
-            "region": REGION,
-            "candidates_raw": len(raw),
-            "candidates_merged": len(merged),
-            "candidates_sellable": len(sellable),
-            "topN": len(winners),
-        },
-    )
+    ckpt.finish()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    ap = argparse.ArgumentParser(description="Pipeline hebdo TikTok -> products")
+    ap.add_argument("--resume", action="store_true", help="reprendre le dernier run inachevé (checkpoints locaux)")
+    args = ap.parse_args()
+    main(resume=args.resume)
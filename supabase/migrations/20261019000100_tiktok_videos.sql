@@ -0,0 +1,26 @@
+-- Mémo incrémental TikTok (pipeline seulement, lu / écrit avec la service role).
+-- À appliquer avant le premier run avec INCREMENTAL=1 (défaut) : supabase db push
+
+-- une ligne par vidéo déjà passée par l'extraction LLM
+-- product_title null = vidéo sans produit vendable (re-testée après TIKTOK_REJECT_TTL_DAYS)
+create table if not exists public.tiktok_videos (
+  video_id      text not null,
+  region        text not null,
+  hashtag       text,
+  created_at    timestamptz,
+  product_title text,
+  last_seen_run date not null,
+  primary key (video_id, region)
+);
+
+-- high-water mark par hashtag : createTimeISO gardé en texte, comparé tel quel côté pipeline
+create table if not exists public.tiktok_hashtags (
+  hashtag         text not null,
+  region          text not null,
+  last_created_at text,
+  videos_seen     integer not null default 0,
+  primary key (hashtag, region)
+);
+
+alter table public.tiktok_videos enable row level security;
+alter table public.tiktok_hashtags enable row level security;
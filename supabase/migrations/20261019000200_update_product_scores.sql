@@ -0,0 +1,23 @@
+-- Report des scores recalculés hors ligne (scripts/rescore.py) sur products, un appel
+-- par chunk au lieu d'un UPDATE par row. products ne garde que le dernier run du slug :
+-- seul le row dont run_date est celui du score recalculé est touché.
+-- rows : [{"slug": "...", "run_date": "YYYY-MM-DD", "score": 72}, ...]
+create or replace function public.update_product_scores(rows jsonb)
+returns integer
+language sql
+as $$
+  with x as (
+    select * from jsonb_to_recordset(rows) as x(slug text, run_date date, score integer)
+  ), u as (
+    update public.products p
+       set score = x.score
+      from x
+     where p.slug = x.slug
+       and p.run_date = x.run_date
+    returning 1
+  )
+  select count(*)::integer from u;
+$$;
+
+-- service role seulement (pipeline / scripts)
+revoke execute on function public.update_product_scores(jsonb) from public, anon, authenticated;
@@ -0,0 +1,14 @@
+-- Histogrammes log-bucketés par run (SCORING_NORM=rank), un par métrique de RANK_METRICS.
+-- Lus par fetch_metric_histograms : region = X, metric in (...), run_date < Y order by run_date desc.
+create table if not exists public.metric_histograms (
+  run_date date not null,
+  region   text not null,
+  metric   text not null,
+  counts   int8[] not null,
+  primary key (run_date, region, metric)
+);
+
+create index if not exists metric_histograms_region_metric_run_date_idx
+  on public.metric_histograms (region, metric, run_date desc);
+
+alter table public.metric_histograms enable row level security;
@@ -0,0 +1,13 @@
+-- Snapshot compact par vidéo et par run : metrics = [views, likes, shares, comments].
+-- Lu par fetch_previous_snapshots : video_id in (...), region = X, run_date dans la fenêtre,
+-- order by run_date desc -> servi par la clé primaire.
+create table if not exists public.tiktok_snapshots (
+  video_id text not null,
+  region   text not null,
+  run_date date not null,
+  run_at   timestamptz not null,
+  metrics  int8[] not null,
+  primary key (video_id, region, run_date)
+);
+
+alter table public.tiktok_snapshots enable row level security;
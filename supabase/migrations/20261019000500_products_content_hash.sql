@@ -0,0 +1,46 @@
+-- Détection des rows products inchangés (cf. supabase_db.content_hash / upsert_products).
+alter table public.products add column if not exists content_hash text;
+
+-- Produits inchangés d'un run : run_date et score avancés sans réécrire le row.
+-- run_date ne recule jamais (--resume d'un run plus ancien).
+-- rows : [{"slug": "...", "run_date": "YYYY-MM-DD", "score": 72}, ...]
+create or replace function public.touch_products(rows jsonb)
+returns integer
+language sql
+as $$
+  with x as (
+    select * from jsonb_to_recordset(rows) as x(slug text, run_date date, score integer)
+  ), u as (
+    update public.products p
+       set run_date = x.run_date,
+           score = x.score
+      from x
+     where p.slug = x.slug
+       and p.run_date <= x.run_date
+    returning 1
+  )
+  select count(*)::integer from u;
+$$;
+
+-- rescoring hors ligne : content_hash remis à null, le row est réécrit en entier au
+-- prochain run (le hash ne doit jamais décrire un row modifié hors upsert_products)
+create or replace function public.update_product_scores(rows jsonb)
+returns integer
+language sql
+as $$
+  with x as (
+    select * from jsonb_to_recordset(rows) as x(slug text, run_date date, score integer)
+  ), u as (
+    update public.products p
+       set score = x.score,
+           content_hash = null
+      from x
+     where p.slug = x.slug
+       and p.run_date = x.run_date
+    returning 1
+  )
+  select count(*)::integer from u;
+$$;
+
+revoke execute on function public.touch_products(jsonb) from public, anon, authenticated;
+revoke execute on function public.update_product_scores(jsonb) from public, anon, authenticated;
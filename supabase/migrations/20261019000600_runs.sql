@@ -0,0 +1,14 @@
+-- Journal des runs hebdo (cf. pipeline/run_log) : une ligne par (run_date, region),
+-- réécrite à chaque étape terminée ; --resume relit la ligne de la tentative interrompue.
+create table if not exists public.runs (
+  run_date    date not null,
+  region      text not null,
+  status      text not null,
+  started_at  timestamptz not null,
+  finished_at timestamptz,
+  stats       jsonb not null default '{}'::jsonb,
+  errors      jsonb not null default '{}'::jsonb,
+  primary key (run_date, region)
+);
+
+alter table public.runs enable row level security;
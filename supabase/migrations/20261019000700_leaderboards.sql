@@ -0,0 +1,49 @@
+-- Classement publié par le pipeline (cf. pipeline/leaderboard), lu par le front en une
+-- seule requête : region = X order by run_date desc limit 2 -> servi par la clé primaire.
+create table if not exists public.leaderboards (
+  region       text not null,
+  run_date     date not null,
+  generated_at timestamptz not null default now(),
+  payload      jsonb not null,
+  primary key (region, run_date)
+);
+
+alter table public.leaderboards enable row level security;
+
+drop policy if exists "leaderboards lisibles par tous" on public.leaderboards;
+create policy "leaderboards lisibles par tous" on public.leaderboards
+  for select using (true);
+
+-- Produit masqué (products.is_hidden passe à true) : retiré tout de suite des classements
+-- publiés, sans attendre le prochain run ni refiltrer à chaque lecture côté front.
+-- Démasquer ne le remet pas : python -m scripts.publish_leaderboard republie le classement.
+create or replace function public.leaderboards_drop_hidden()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+  update public.leaderboards l
+     set payload = jsonb_set(
+           l.payload,
+           '{products}',
+           coalesce(
+             (select jsonb_agg(e order by i)
+                from jsonb_array_elements(l.payload -> 'products') with ordinality as t(e, i)
+               where e ->> 'slug' is distinct from new.slug),
+             '[]'::jsonb
+           )
+         ),
+         generated_at = now()
+   where l.payload -> 'products' @> jsonb_build_array(jsonb_build_object('slug', new.slug));
+  return null;
+end;
+$$;
+
+drop trigger if exists products_hidden_leaderboards on public.products;
+create trigger products_hidden_leaderboards
+  after update of is_hidden on public.products
+  for each row
+  when (new.is_hidden and not coalesce(old.is_hidden, false))
+  execute function public.leaderboards_drop_hidden();
@@ -0,0 +1,30 @@
+-- Découpage products / product_analyses (cf. supabase_db.analysis_row / list_row).
+-- À appliquer avant le premier run qui écrit les deux tables, puis migrer les anciens
+-- rows : python -m scripts.rescore --from <premier run> --to <dernier run>
+-- (backfill_product_analyses en premier, idempotent ; --dry-run pour compter).
+
+-- analyse complète par run ; analysis / signals nullables : rescore et backfill font
+-- des upserts partiels sur (slug, run_date)
+create table if not exists public.product_analyses (
+  slug            text not null,
+  run_date        date not null,
+  title           text,
+  score           integer,
+  analysis        jsonb,
+  signals         jsonb,
+  score_breakdown jsonb,
+  primary key (slug, run_date)
+);
+
+alter table public.product_analyses enable row level security;
+
+-- fiche produit (utilisateur connecté) : slug = X and run_date <= Y order by run_date desc limit 1
+drop policy if exists "product_analyses lisibles connecté" on public.product_analyses;
+create policy "product_analyses lisibles connecté" on public.product_analyses
+  for select to authenticated using (true);
+
+-- products allégé : 3 premiers risques pour la liste, blobs remis à null
+alter table public.products add column if not exists risks jsonb not null default '[]'::jsonb;
+alter table public.products alter column analysis drop not null;
+alter table public.products alter column signals drop not null;
+alter table public.products alter column score_breakdown drop not null;
@@ -0,0 +1,6 @@
+-- Bucket public des médias miroités (cf. pipeline/media, pipeline/thumbnails) :
+-- videos/, images/, thumbs/ ; chemins = hash du contenu, jamais réécrits.
+-- Nom surchargeable côté pipeline par SUPABASE_MEDIA_BUCKET (créer le bucket en conséquence).
+insert into storage.buckets (id, name, public)
+values ('product-media', 'product-media', true)
+on conflict (id) do nothing;
@@ -0,0 +1,3 @@
+-- Vignette grande largeur pour la fiche produit (cf. pipeline/thumbnails) ;
+-- null = anciens rows, la fiche retombe sur image_url.
+alter table public.products add column if not exists image_detail_url text;